@@ -1,15 +1,182 @@
+import asyncio
 import json
 import logging
+import os
 import uuid
-from typing import Dict, List, Any, Optional
+from functools import lru_cache
+from typing import Callable, Dict, List, Any, Optional, Tuple
 import httpx
+import orjson
 import re
 
 from app.services.llm_connector import OllamaConnector
 from app.services.context_manager import ContextManager
+from app.services.exact_cache import LRUCache, TTLCache, prompt_key
+from app.services.semantic_cache import SemanticCache
+from app.services.aiohttp_client import AiohttpClient
 
 logger = logging.getLogger(__name__)
 
+# HTTP client implementation for Tool Manager calls: "httpx" or "aiohttp"
+HTTP_BACKEND = os.environ.get("AGENT_HTTP_BACKEND", "httpx").lower()
+
+# Patterns used to pull JSON out of free-form LLM output, compiled once
+_CODE_BLOCK_RE = re.compile(r'```(?:json)?\s*(.*?)\s*```', re.DOTALL)
+_LEADING_OBJECT_RE = re.compile(r'\s*\{')
+# Decodes a leading object without requiring it to span the whole text
+_DECODER = json.JSONDecoder()
+# Only these characters can change the scanner state; everything else is skipped in C
+_JSON_STRUCTURAL_RE = re.compile(r'[{}"\\]')
+
+@lru_cache(maxsize=32)
+def _find_json_objects(text: str) -> Tuple[Tuple[int, int], ...]:
+    """
+    Locate the top-level {...} regions of a text in a single pass.
+    
+    Braces inside JSON string literals are ignored, so nested objects and
+    strings such as "{not a brace}" don't break the balance count. The
+    loop only visits structural characters, so long runs of prose cost
+    nothing at the Python level.
+    
+    Args:
+        text: Text to scan
+        
+    Returns:
+        Tuple of (start, end) offsets, usable as text[start:end]
+    """
+    spans = []
+    depth = 0
+    start = 0
+    in_string = False
+    escaped_at = -1
+    
+    for match in _JSON_STRUCTURAL_RE.finditer(text):
+        i = match.start()
+        char = match.group()
+        if in_string:
+            if i == escaped_at:
+                continue
+            if char == "\\":
+                escaped_at = i + 1
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = depth > 0
+        elif char == "{":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif char == "}" and depth > 0:
+            depth -= 1
+            if depth == 0:
+                spans.append((start, i + 1))
+    
+    return tuple(spans)
+
+# Python types accepted for each JSON Schema type in tool parameter schemas
+_JSON_SCHEMA_TYPES = {
+    "string": str,
+    "integer": int,
+    "number": (int, float),
+    "boolean": bool,
+    "object": dict,
+    "array": list,
+    "null": type(None),
+}
+
+def _python_types(schema_type: Any) -> Optional[Tuple[type, ...]]:
+    """
+    Map a JSON Schema type, or a list of them, to the matching Python types.
+    
+    Args:
+        schema_type: Value of a property's "type" keyword
+        
+    Returns:
+        Tuple of accepted Python types, or None if no type is known
+    """
+    names = schema_type if isinstance(schema_type, list) else [schema_type]
+    types = []
+    for name in names:
+        if not isinstance(name, str) or name not in _JSON_SCHEMA_TYPES:
+            continue
+        expected = _JSON_SCHEMA_TYPES[name]
+        types.extend(expected if isinstance(expected, tuple) else (expected,))
+    return tuple(types) or None
+
+@lru_cache(maxsize=256)
+def _compile_parameter_check(schema_json: bytes) -> Callable[[Dict[str, Any]], Optional[str]]:
+    """
+    Build a validator for tool call parameters from a tool's JSON schema.
+    
+    Covers what the model most often gets wrong (missing required
+    parameters, wrong types, values outside an enum), so those calls fail
+    locally instead of costing a round trip to the Tool Manager. Compiled
+    validators are cached by the serialized schema.
+    
+    Args:
+        schema_json: The tool's parameters schema, serialized with orjson
+        
+    Returns:
+        Function returning an error message for invalid parameters, or None
+    """
+    schema = orjson.loads(schema_json)
+    required = tuple(schema.get("required", ()))
+    checks = []
+    properties = schema.get("properties")
+    for name, spec in (properties.items() if isinstance(properties, dict) else ()):
+        if not isinstance(spec, dict):
+            continue
+        enum = spec.get("enum")
+        checks.append((name, _python_types(spec.get("type")), tuple(enum) if isinstance(enum, list) and enum else None))
+    
+    def check(parameters: Dict[str, Any]) -> Optional[str]:
+        if not isinstance(parameters, dict):
+            return "parameters must be an object"
+        missing = [name for name in required if name not in parameters]
+        if missing:
+            return f"missing required parameters: {', '.join(missing)}"
+        for name, expected, enum in checks:
+            if name not in parameters:
+                continue
+            value = parameters[name]
+            # bool is a subclass of int, but not a JSON integer or number
+            if expected is not None and (not isinstance(value, expected) or (isinstance(value, bool) and bool not in expected)):
+                return f"parameter {name} has the wrong type"
+            if enum is not None and value not in enum:
+                return f"parameter {name} must be one of: {', '.join(map(str, enum))}"
+        return None
+    
+    return check
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Create an HTTP client tuned for talking to the Tool Manager.
+    
+    Tool lookup and execution hit the same host back to back, so connections
+    are kept alive between them instead of reconnecting per call. Setting
+    AGENT_HTTP_BACKEND=aiohttp swaps in an aiohttp-based client with the
+    same interface (requires the optional aiohttp package).
+    
+    Returns:
+        A new client; the caller is responsible for closing it
+    """
+    if HTTP_BACKEND == "aiohttp":
+        return AiohttpClient(
+            timeout=60.0,
+            connect_timeout=5.0,
+            max_connections=100,
+            keepalive_expiry=30.0
+        )
+    
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(60.0, connect=5.0),
+        limits=httpx.Limits(
+            max_keepalive_connections=50,
+            max_connections=100,
+            keepalive_expiry=30.0
+        )
+    )
+
 class Agent:
     """
     Main agent class that orchestrates the interaction between user input,
@@ -22,7 +189,8 @@ class Agent:
     def __init__(self, 
                  tool_manager_url: str,
                  ollama_base_url: str = "http://localhost:11434",
-                 model: str = "gemma3"):
+                 model: str = "gemma3",
+                 http_client: Optional[httpx.AsyncClient] = None):
         """
         Initialize the agent with necessary services.
         
@@ -30,13 +198,24 @@ class Agent:
             tool_manager_url: URL of the Tool Manager API
             ollama_base_url: Base URL for Ollama API
             model: Default LLM model to use
+            http_client: Shared HTTP client for Tool Manager calls; if None the
+                agent creates (and closes) its own
         """
         self.tool_manager_url = tool_manager_url
         self.llm_connector = OllamaConnector(base_url=ollama_base_url, model=model)
         self.context_manager = ContextManager()
-        self.http_client = httpx.AsyncClient(timeout=60.0)
+        self.exact_cache = LRUCache()
+        self.semantic_cache = SemanticCache()
+        # The tool catalog changes slowly, so lookups are reused for a few minutes
+        self.tool_lookup_cache = TTLCache(maxsize=512, ttl=300.0)
+        # (conversation_id, prompt) pairs whose tool lookup or generation failed
+        # recently; retries within the TTL go straight to a tool-less generation
+        self.negative_cache = TTLCache(maxsize=512, ttl=60.0)
+        # A client passed in is owned (and closed) by the caller
+        self._owns_http_client = http_client is None
+        self.http_client = http_client or create_http_client()
         
-    async def _fetch_relevant_tools(self, prompt: str, top_k: int = 3) -> List[Dict[str, Any]]:
+    async def _fetch_relevant_tools(self, prompt: str, top_k: int = 3) -> Optional[List[Dict[str, Any]]]:
         """
         Fetch tools relevant to the user prompt from the Tool Manager API.
         
@@ -45,8 +224,14 @@ class Agent:
             top_k: Number of most relevant tools to return
             
         Returns:
-            List of tool definitions
+            List of tool definitions, or None if the lookup failed
         """
+        cache_key = (prompt, top_k)
+        cached = self.tool_lookup_cache.get(cache_key)
+        if cached is not None:
+            logger.debug(f"Using cached tool lookup for prompt: {prompt}")
+            return cached
+        
         try:
             logger.debug(f"Fetching relevant tools for prompt: {prompt}")
             url = f"{self.tool_manager_url}/tool_lookup"
@@ -58,15 +243,17 @@ class Agent:
             response.raise_for_status()
             
             result = response.json()
-            logger.debug(f"Found {len(result.get('tools', []))} relevant tools")
-            return result.get("tools", [])
+            tools = result.get("tools", [])
+            logger.debug(f"Found {len(tools)} relevant tools")
+            self.tool_lookup_cache.put(cache_key, tools)
+            return tools
             
         except httpx.HTTPStatusError as e:
             logger.error(f"HTTP error during tool lookup: {e.response.status_code} - {e.response.text}")
-            return []
+            return None
         except Exception as e:
             logger.error(f"Error fetching relevant tools: {str(e)}")
-            return []
+            return None
     
     async def _execute_tool(self, tool_call: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -99,6 +286,67 @@ class Agent:
             logger.error(f"Error executing tool: {str(e)}")
             return {"result": None, "error": str(e)}
     
+    @staticmethod
+    def _validate_tool_call(tool_call: Dict[str, Any], tools: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        Check a tool call's parameters against the tool's schema, if known.
+        
+        Args:
+            tool_call: Tool call with name and parameters
+            tools: Tool definitions offered to the model for this turn
+            
+        Returns:
+            An error message if the parameters are invalid, None otherwise
+        """
+        for tool in tools:
+            if tool.get("name") == tool_call.get("name"):
+                schema = tool.get("parameters")
+                if not schema:
+                    return None
+                check = _compile_parameter_check(orjson.dumps(schema, option=orjson.OPT_SORT_KEYS))
+                return check(tool_call.get("parameters", {}))
+        # Unknown to us; leave it to the Tool Manager
+        return None
+    
+    async def _run_tool_call(self, tool_call: Dict[str, Any], tools: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Validate a tool call locally, then execute it if the parameters are valid.
+        
+        Args:
+            tool_call: Tool call definition with name and parameters
+            tools: Tool definitions offered to the model for this turn
+            
+        Returns:
+            Tool execution result, or an error result for invalid parameters
+        """
+        try:
+            error = self._validate_tool_call(tool_call, tools)
+        except Exception as e:
+            # A schema we can't interpret is the Tool Manager's to judge
+            logger.warning(f"Could not validate tool call {tool_call.get('name')} locally: {str(e)}")
+            error = None
+        if error:
+            logger.warning(f"Rejected tool call {tool_call.get('name')}: {error}")
+            return {"result": None, "error": f"Invalid parameters: {error}"}
+        return await self._execute_tool(tool_call)
+    
+    @staticmethod
+    def _as_tool_calls(tool_call: Any) -> List[Dict[str, Any]]:
+        """
+        Normalize the tool_call field of a parsed response to a list of calls.
+        
+        Args:
+            tool_call: A single call object, a list of them, or None
+            
+        Returns:
+            List of tool call definitions (empty if there are none)
+        """
+        if isinstance(tool_call, dict):
+            return [tool_call]
+        if isinstance(tool_call, list):
+            return [call for call in tool_call if isinstance(call, dict)]
+        return []
+    
     async def _parse_llm_response(self, response: Dict[str, Any]) -> Dict[str, Any]:
         """
         Parse the LLM response to extract potential tool calls.
@@ -107,47 +355,75 @@ class Agent:
             response: Raw LLM response
             
         Returns:
-            Parsed response with text and potential tool_call
+            Parsed response with text, potential tool_call, and whether the
+            reply followed the requested JSON format (structured)
         """
         text = response.get("response", "")
         tool_call = None
         
-        # First try to parse directly as JSON #1
-        try:
-            parsed = json.loads(text)
+        # Decide up front which extraction strategies can apply, using cheap
+        # C-level checks instead of running every parser over the text
+        leading_object = _LEADING_OBJECT_RE.match(text)
+        has_code_block = "```" in text
+        # The fallbacks #3 and #4 only accept objects with a tool_call key
+        may_embed_tool_call = "{" in text and "tool_call" in text
+        
+        # First try to parse directly as JSON #1 (only worth it for an object)
+        if leading_object:
+            try:
+                parsed = orjson.loads(text)
+            except orjson.JSONDecodeError:
+                # The object may be followed by trailing prose ("} Hope this
+                # helps!"); raw_decode stops at the end of the first object.
+                # Only accept it if it has the shape we asked the model for.
+                try:
+                    parsed, _ = _DECODER.raw_decode(text, leading_object.end() - 1)
+                except json.JSONDecodeError:
+                    parsed = None
+                if isinstance(parsed, dict) and "response" not in parsed and "tool_call" not in parsed:
+                    parsed = None
+                    
             if isinstance(parsed, dict):
                 # Extract the response text and tool call if available
                 text = parsed.get("response", text)
                 tool_call = parsed.get("tool_call")
                 return {
                     "text": text.strip(),
-                    "tool_call": tool_call
+                    "tool_call": tool_call,
+                    "structured": True
                 }
-        except json.JSONDecodeError as e:
-            pass
-            # logger.warning(f"Failed to parse response as JSON: {str(e)}")
         
         # Try to extract JSON from markdown code blocks #2
         try:
             # Match both ```json and ``` code blocks
-            match = re.search(r'```(?:json)?\s*(.*?)\s*```', text, re.DOTALL)
-            if match:
-                data = json.loads(match.group(1))
-                return dict(**data) # TODO: use pydantic models
+            match = _CODE_BLOCK_RE.search(text) if has_code_block else None
+            data = orjson.loads(match.group(1)) if match else None
+            # Like #1, only a block in the requested shape is the reply; any
+            # other fenced JSON is an example inside a plain-text answer
+            if isinstance(data, dict) and ("response" in data or "tool_call" in data):
+                return {
+                    "text": str(data.get("response", "")).strip(),
+                    "tool_call": data.get("tool_call"),
+                    "structured": True
+                }
             
-        except (json.JSONDecodeError, AttributeError, IndexError):
+        except (orjson.JSONDecodeError, AttributeError, IndexError):
             pass
         
-        # Fall back to regex patterns if direct parsing fails #3
+        if not may_embed_tool_call:
+            return {
+                "text": text.strip(),
+                "tool_call": None,
+                "structured": False
+            }
+        
+        # Fall back to scanning for embedded objects if direct parsing fails #3
         try:
             # Look for a JSON object that might contain a tool call
-            json_pattern = r'\{(?:[^{}]|(?:\{[^{}]*\}))*\}'
-            matches = re.finditer(json_pattern, text)
-            
-            for match in matches:
-                potential_json = match.group(0)
+            for start, end in _find_json_objects(text):
+                potential_json = text[start:end]
                 try:
-                    parsed_json = json.loads(potential_json)
+                    parsed_json = orjson.loads(potential_json)
                     if "tool_call" in parsed_json:
                         tool_call = parsed_json["tool_call"]
                         # Use the response text if available
@@ -157,26 +433,26 @@ class Agent:
                             # Remove the JSON from the text
                             text = text.replace(potential_json, "")
                         break
-                except json.JSONDecodeError:
+                except orjson.JSONDecodeError:
                     continue
             
         except Exception as e:
-            logger.error(f"Error parsing LLM response with regex: {str(e)}")
+            logger.error(f"Error scanning LLM response for JSON: {str(e)}")
         
-        # If all else fails, try the basic approach as a last resort #4
-        if not tool_call and "{" in text and "}" in text:
+        # If all else fails, retry the same balanced objects as a last resort #4,
+        # with single quotes swapped for double quotes (Python-style dicts)
+        if not tool_call:
             try:
-                # Simple approach: find outermost { and }
-                json_start = text.find("{")
-                json_end = text.rfind("}") + 1
-                
-                potential_json = text[json_start:json_end]
-                
-                # Replace single quotes with double quotes for valid JSON
-                potential_json = potential_json.replace("'", '"')
-                
-                try:
-                    parsed_json = json.loads(potential_json)
+                for start, end in _find_json_objects(text):
+                    potential_json = text[start:end]
+                    if "'" not in potential_json:
+                        # Already tried verbatim in #3
+                        continue
+                    try:
+                        parsed_json = orjson.loads(potential_json.replace("'", '"'))
+                    except orjson.JSONDecodeError:
+                        logger.debug(f"Failed to parse JSON: {potential_json}")
+                        continue
                     if "tool_call" in parsed_json:
                         tool_call = parsed_json["tool_call"]
                         # Use the response text if available
@@ -184,15 +460,15 @@ class Agent:
                             text = parsed_json["response"]
                         else:
                             # Remove the JSON from the text
-                            text = text[:json_start] + text[json_end:]
-                except json.JSONDecodeError:
-                    logger.debug(f"Failed to parse JSON: {potential_json}")
+                            text = text[:start] + text[end:]
+                        break
             except Exception as e:
                 logger.error(f"Error in basic JSON parsing approach: {str(e)}")
         
         return {
             "text": text.strip(),
-            "tool_call": tool_call
+            "tool_call": tool_call,
+            "structured": False
         }
     
     async def process_input(self, 
@@ -223,15 +499,40 @@ class Agent:
             
         logger.info(f"Processing input for conversation {conversation_id}: {user_input}")
         
-        # Step 1: Fetch relevant tools based on user input
-        relevant_tools = await self._fetch_relevant_tools(user_input)
+        # Responses only depend on the prompt when there is no prior history,
+        # so only fresh conversations can be served from (and fill) the cache
+        use_cache = not debug_mode and not self.context_manager.has_history(conversation_id)
+        if use_cache:
+            cached = self.exact_cache.get(user_input)
+            if cached is not None:
+                logger.info(f"Serving exact cached response for conversation {conversation_id}")
+                return self._respond_from_cache(conversation_id, user_input, cached)
+            
+            cached = self.semantic_cache.get(user_input)
+            if cached is not None:
+                logger.info(f"Serving cached response for equivalent input in conversation {conversation_id}")
+                return self._respond_from_cache(conversation_id, user_input, cached)
+        
+        # Step 1: Fetch relevant tools based on user input. Retries of a
+        # recently failed turn skip the lookup altogether; the key includes
+        # the conversation so one conversation can't affect another.
+        input_key = (conversation_id, prompt_key(user_input))
+        lookup_skipped = input_key in self.negative_cache
+        fetched_tools = None
+        if lookup_skipped:
+            logger.info(f"Skipping tool lookup for recently failed input in conversation {conversation_id}")
+        else:
+            fetched_tools = await self._fetch_relevant_tools(user_input)
         
         # Step 2: Get the full context for the prompt
         context = self.context_manager.get_full_context(
             conversation_id=conversation_id,
-            user_input=user_input,
-            tools=relevant_tools
+            user_input=user_input
         )
+        # Answers generated without a real tool lookup are not cacheable
+        tools_looked_up = fetched_tools is not None
+        relevant_tools = fetched_tools or []
+        context["tools"] = relevant_tools
         
         # Create the debug info dictionary if debug mode is enabled
         debug_info = {}
@@ -256,55 +557,68 @@ class Agent:
         
         # Step 4: Parse the LLM response to check for tool calls
         parsed_response = await self._parse_llm_response(llm_response)
-        response_text = parsed_response.get("response", "")
-        tool_call = parsed_response.get("tool_call")
+        response_text = parsed_response.get("text", "")
+        tool_calls = self._as_tool_calls(parsed_response.get("tool_call"))
+        # A plain answer in the requested format is not a failure; only a
+        # failed lookup, an Ollama error or an unparseable reply is
+        if not lookup_skipped and (
+            not tools_looked_up
+            or "error" in llm_response
+            or (not tool_calls and not parsed_response.get("structured"))
+        ):
+            self.negative_cache.put(input_key, True)
         
-        # Step 5: Execute tool if a tool call was detected
-        tool_result = None
-        if tool_call:
-            logger.info(f"Tool call detected: {tool_call}")
-            
-            # Record the tool call in context
-            self.context_manager.add_tool_call(
-                conversation_id=conversation_id,
-                tool_name=tool_call.get("name", "unknown"),
-                parameters=tool_call.get("parameters", {})
-            )
-            
-            # Execute the tool
-            tool_result = await self._execute_tool(tool_call)
+        # Step 5: Execute the tools if tool calls were detected
+        tool_results = []
+        if tool_calls:
+            logger.info(f"Tool calls detected: {tool_calls}")
             
-            # Update the tool call with the result
-            # TODO: fix to exclude useless tokens
-            self.context_manager.add_tool_call(
-                conversation_id=conversation_id,
-                tool_name=tool_call.get("name", "unknown"),
-                parameters=tool_call.get("parameters", {}),
-                result=tool_result.get("result"),
-                error=tool_result.get("error")
+            # Independent calls run concurrently; _run_tool_call never raises
+            tool_results = await asyncio.gather(
+                *(self._run_tool_call(call, relevant_tools) for call in tool_calls)
             )
             
-            # If tool execution was successful, generate a follow-up response
-            if tool_result.get("result") is not None:
-                # Get updated context with tool result
-                updated_context = self.context_manager.get_full_context(
+            # Record each tool call in context together with its outcome
+            for call, tool_result in zip(tool_calls, tool_results):
+                self.context_manager.add_tool_call(
                     conversation_id=conversation_id,
-                    user_input=user_input,
-                    tools=relevant_tools
+                    tool_name=call.get("name", "unknown"),
+                    parameters=call.get("parameters", {}),
+                    result=tool_result.get("result"),
+                    error=tool_result.get("error")
                 )
+            
+            # If any tool execution was successful, generate a follow-up response
+            succeeded = [
+                f"the tool {call.get('name')} with parameters "
+                f"{orjson.dumps(call.get('parameters')).decode()} and got the result: "
+                f"{orjson.dumps(tool_result.get('result')).decode()}"
+                for call, tool_result in zip(tool_calls, tool_results)
+                if tool_result.get("result") is not None
+            ]
+            if succeeded:
+                # Only the tool calls changed since step 2, and the user message is
+                # already recorded, so reuse the history (memoized) and system message
+                updated_history = self.context_manager.get_formatted_history(conversation_id)
                 
                 # Generate follow-up response with tool result context
-                follow_up_prompt = (
-                    f"I executed the tool {tool_call.get('name')} with parameters "
-                    f"{json.dumps(tool_call.get('parameters'))} and got the result: "
-                    f"{json.dumps(tool_result.get('result'))}. Please provide a helpful "
-                    f"response based on this result."
-                )
+                if len(succeeded) == 1:
+                    follow_up_prompt = (
+                        f"I executed {succeeded[0]}. Please provide a helpful "
+                        f"response based on this result."
+                    )
+                else:
+                    follow_up_prompt = (
+                        "I executed the following tools:\n"
+                        + "".join(f"- {line}\n" for line in succeeded)
+                        + "Please provide a helpful response based on these results."
+                    )
                 
                 follow_up_response = await self.llm_connector.generate_with_tool_context(
                     prompt=follow_up_prompt,
                     tools=relevant_tools,
-                    conversation_context=updated_context.get("conversation_history")
+                    conversation_context=updated_history,
+                    system_message=context.get("system_message")
                 )
                 
                 if debug_mode:
@@ -312,7 +626,7 @@ class Agent:
                     debug_info["raw_follow_up_response"] = follow_up_response
                 
                 parsed_follow_up = await self._parse_llm_response(follow_up_response)
-                response_text = parsed_follow_up.get("response", "")
+                response_text = parsed_follow_up.get("text", "")
         
         # Step 6: Record the assistant's response in the context
         self.context_manager.add_message(
@@ -321,33 +635,78 @@ class Agent:
             content=response_text
         )
         
-        # Return the final response with any tool usage information
+        # Cache plain answers; tool results may be time- or state-dependent.
+        # Degraded answers (Ollama errors, unformatted replies, or replies
+        # generated without the tool lookup) must not outlive the problem.
+        cacheable = (
+            not tool_calls
+            and response_text
+            and "error" not in llm_response
+            and tools_looked_up
+            and parsed_response.get("structured")
+        )
+        if use_cache and cacheable:
+            cached = {"response": response_text}
+            self.exact_cache.put(user_input, cached)
+            self.semantic_cache.put(user_input, cached)
+        
+        # Return the final response with any tool usage information. The
+        # tool_* fields describe the first call; tool_calls lists all of them
+        first_call = tool_calls[0] if tool_calls else None
         response = {
             "conversation_id": conversation_id,
             "response": response_text,
-            "tool_used": tool_call.get("name") if tool_call else None,
-            "tool_parameters": tool_call.get("parameters") if tool_call else None,
-            "tool_result": tool_result
+            "tool_used": first_call.get("name") if first_call else None,
+            "tool_parameters": first_call.get("parameters") if first_call else None,
+            "tool_result": tool_results[0] if tool_results else None,
+            "tool_calls": [
+                {"name": call.get("name"), "parameters": call.get("parameters"), "result": tool_result}
+                for call, tool_result in zip(tool_calls, tool_results)
+            ] or None
         }
         
         # Add debug info if debug mode is enabled
         if debug_mode:
-            debug_info["raw_llm_response"] = llm_response
             response["debug_info"] = debug_info
             
-        # Log a warning if we didn't get a proper JSON response
-        if debug_mode and not tool_call and ("raw_llm_response" in debug_info):
-            raw_response = debug_info.get("raw_llm_response", {}).get("response", "")
-            try:
-                # Check if the raw response is valid JSON
-                json.loads(raw_response)
-            except json.JSONDecodeError:
+            # Log a warning if we didn't get a proper JSON response; the parser
+            # already knows, so the raw response isn't decoded a second time
+            if not tool_calls and not parsed_response.get("structured"):
                 logger.warning("LLM failed to respond with proper JSON formatting")
 
         return response
     
+    def _respond_from_cache(self, 
+                            conversation_id: str, 
+                            user_input: str, 
+                            cached: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build a response from a cache entry and record the exchange in the context.
+        
+        Args:
+            conversation_id: Conversation ID for the response
+            user_input: User's input text
+            cached: Cached response payload
+            
+        Returns:
+            Response in the same shape as process_input
+        """
+        response_text = cached.get("response", "")
+        self.context_manager.add_message(conversation_id, "user", user_input)
+        self.context_manager.add_message(conversation_id, "assistant", response_text)
+        
+        return {
+            "conversation_id": conversation_id,
+            "response": response_text,
+            "tool_used": None,
+            "tool_parameters": None,
+            "tool_result": None,
+            "tool_calls": None
+        }
+    
     async def close(self):
         """Close the HTTP client and resources."""
-        await self.http_client.aclose()
+        if self._owns_http_client:
+            await self.http_client.aclose()
         await self.llm_connector.close()
         logger.info("Agent resources closed") 
\ No newline at end of file
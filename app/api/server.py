@@ -2,14 +2,16 @@ import os
 import json
 import logging
 import uuid
+from contextlib import asynccontextmanager
 from typing import Dict, Any, Optional, List
 
 from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
 from starlette.concurrency import run_in_threadpool
 
-from app.agent import Agent
+from app.agent import Agent, create_http_client
 
 # Configure logging
 logging.basicConfig(
@@ -23,11 +25,15 @@ TOOL_MANAGER_URL = os.environ.get("TOOL_MANAGER_URL", "http://localhost:8000")
 OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
 DEFAULT_MODEL = os.environ.get("DEFAULT_MODEL", "gemma3")
 
+# One connection pool for the whole process, closed by the lifespan handler
+http_client = create_http_client()
+
 # Initialize a single Agent instance for all requests
 agent_instance = Agent(
     tool_manager_url=TOOL_MANAGER_URL,
     ollama_base_url=OLLAMA_BASE_URL,
     model=DEFAULT_MODEL,
+    http_client=http_client,
 )
 
 # Define request and response models
@@ -41,13 +47,25 @@ class AgentResponse(BaseModel):
     tool_used: Optional[str] = None
     tool_parameters: Optional[Dict[str, Any]] = None
     tool_result: Optional[Dict[str, Any]] = None
+    tool_calls: Optional[List[Dict[str, Any]]] = None
     debug_info: Optional[Dict[str, Any]] = None
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Close resources when application shuts down."""
+    yield
+    logger.info("Shutting down API server, closing resources...")
+    await agent_instance.close()
+    await http_client.aclose()
+    logger.info("Resources closed successfully")
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Agent API",
     description="API for interacting with the LLM-powered agent",
     version="0.1.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -117,14 +135,15 @@ async def get_conversation(conversation_id: str, agent: Agent = Depends(get_agen
             raise HTTPException(status_code=404, detail=f"Conversation {conversation_id} not found")
             
         # Get conversation data
-        conv = agent.context_manager.conversations[conversation_id]
+        context_manager = agent.context_manager
+        conv = context_manager.conversations[conversation_id]
         
         # Convert to serializable format
         messages = [
             {
                 "role": msg.role,
                 "content": msg.content,
-                "timestamp": msg.timestamp.isoformat()
+                "timestamp": context_manager.to_datetime(msg.timestamp_ns)
             }
             for msg in conv.messages
         ]
@@ -135,26 +154,21 @@ async def get_conversation(conversation_id: str, agent: Agent = Depends(get_agen
                 "parameters": tc.parameters,
                 "result": tc.result,
                 "error": tc.error,
-                "timestamp": tc.timestamp.isoformat()
+                "timestamp": context_manager.to_datetime(tc.timestamp_ns)
             }
             for tc in conv.tool_calls
         ]
         
-        return {
+        # Returned as a response directly: orjson serializes the datetimes
+        # natively, without a jsonable_encoder pass over the whole payload
+        return ORJSONResponse({
             "conversation_id": conversation_id,
             "messages": messages,
             "tool_calls": tool_calls
-        }
+        })
         
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"Error getting conversation: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Error getting conversation: {str(e)}")
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Close resources when application shuts down."""
-    logger.info("Shutting down API server, closing resources...")
-    await agent_instance.close()
-    logger.info("Resources closed successfully") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error getting conversation: {str(e)}") 
\ No newline at end of file
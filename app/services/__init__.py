@@ -4,4 +4,7 @@ Services module for the Apollo Tech Agent.
 This package contains service components such as:
 - LLM Connector: For communicating with the LLM engine
 - Context Manager: For managing conversation context
+- Exact Cache: For reusing answers to repeated prompts
+- Semantic Cache: For reusing answers to prompts that differ only in surrounding whitespace
+- aiohttp Client: Optional aiohttp transport for Tool Manager calls
 """ 
\ No newline at end of file
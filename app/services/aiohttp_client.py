@@ -0,0 +1,89 @@
+import logging
+from typing import Any, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Headers describing the wire encoding of the body, which no longer apply
+# once aiohttp has decoded it
+_BODY_ENCODING_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+class AiohttpClient:
+    """
+    aiohttp-backed drop-in for the subset of httpx.AsyncClient the agent uses.
+
+    Requests go through a pooled aiohttp.ClientSession, but responses are
+    returned as httpx.Response objects, so callers keep using
+    raise_for_status(), json() and httpx.HTTPStatusError unchanged.
+
+    aiohttp is an optional dependency and is only imported when this
+    client is constructed.
+    """
+
+    def __init__(self,
+                 timeout: float = 60.0,
+                 connect_timeout: float = 5.0,
+                 max_connections: int = 100,
+                 keepalive_expiry: float = 30.0):
+        """
+        Initialize the client.
+
+        Args:
+            timeout: Total timeout for a request in seconds
+            connect_timeout: Timeout for establishing a connection in seconds
+            max_connections: Maximum number of concurrent connections
+            keepalive_expiry: How long idle connections are kept open in seconds
+        """
+        try:
+            import aiohttp
+        except ImportError as e:
+            raise ImportError("The aiohttp HTTP backend requires the aiohttp package: pip install aiohttp") from e
+
+        self._aiohttp = aiohttp
+        self._timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self._max_connections = max_connections
+        self._keepalive_expiry = keepalive_expiry
+        # Created on first use: a session must be created inside a running loop
+        self._session: Optional[Any] = None
+
+    def _get_session(self):
+        """Get the pooled session, creating it on first use."""
+        if self._session is None or self._session.closed:
+            connector = self._aiohttp.TCPConnector(
+                limit=self._max_connections,
+                keepalive_timeout=self._keepalive_expiry
+            )
+            self._session = self._aiohttp.ClientSession(connector=connector, timeout=self._timeout)
+        return self._session
+
+    async def post(self, url: str, json: Any = None) -> httpx.Response:
+        """
+        Send a POST request with a JSON body.
+
+        Args:
+            url: Request URL
+            json: Value to send as the JSON body
+
+        Returns:
+            The response, fully read, as an httpx.Response
+        """
+        async with self._get_session().post(url, json=json) as response:
+            content = await response.read()
+            # aiohttp has already de-chunked and decompressed the body
+            headers = [
+                (name, value) for name, value in response.headers.items()
+                if name.lower() not in _BODY_ENCODING_HEADERS
+            ]
+            return httpx.Response(
+                status_code=response.status,
+                headers=headers,
+                content=content,
+                request=httpx.Request("POST", url)
+            )
+
+    async def aclose(self) -> None:
+        """Close the underlying session."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
@@ -1,34 +1,70 @@
 import logging
-from typing import Dict, List, Any, Optional
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Deque, Dict, List, Any, Optional, Tuple
 from datetime import datetime
-from pydantic import BaseModel, Field, ConfigDict
+import orjson
 
 logger = logging.getLogger(__name__)
 
-class Message(BaseModel):
+# System message that instructs the model
+_SYSTEM_MESSAGE_BASE = (
+    "You are a  smart AI assistant with access to tools. "
+    "Use these tools when appropriate to fulfill user requests. "
+    "Always be helpful, accurate, and concise. "
+    "IMPORTANT: You must remember all previously shared information within the conversation. "
+    "If the user shares their name or preferences, remember this information for the duration of the conversation."
+)
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate how many tokens a text takes up in the prompt.
+    
+    Uses the common ~4 characters per token rule of thumb, which is close
+    enough for budgeting across the different models Ollama can serve.
+    
+    Args:
+        text: Text to measure
+        
+    Returns:
+        Estimated token count (at least 1 for non-empty text)
+    """
+    return (len(text) + 3) // 4
+
+def _compact_json(value: Any) -> str:
+    """Serialize a value as compact JSON, falling back to str() for unknown types."""
+    return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+@dataclass(slots=True)
+class Message:
     """Model representing a message in the conversation"""
     role: str
     content: str
-    timestamp: datetime = Field(default_factory=datetime.now)
-    
-    model_config = ConfigDict(arbitrary_types_allowed=True)
+    # Estimated prompt tokens for the rendered "Role: content" line
+    tokens: int = 0
+    # Monotonic clock reading; see ContextManager.to_datetime for wall-clock time
+    timestamp_ns: int = field(default_factory=time.monotonic_ns)
 
-class ToolCall(BaseModel):
+@dataclass(slots=True)
+class ToolCall:
     """Model representing a tool call"""
     tool_name: str
     parameters: Dict[str, Any]
     result: Optional[Any] = None
     error: Optional[str] = None
-    timestamp: datetime = Field(default_factory=datetime.now)
-    
-    model_config = ConfigDict(arbitrary_types_allowed=True)
+    timestamp_ns: int = field(default_factory=time.monotonic_ns)
 
-class ConversationContext(BaseModel):
+@dataclass(slots=True)
+class ConversationContext:
     """Model representing the full conversation context"""
-    messages: List[Message] = Field(default_factory=list)
-    tool_calls: List[ToolCall] = Field(default_factory=list)
-    
-    model_config = ConfigDict(arbitrary_types_allowed=True)
+    messages: Deque[Message] = field(default_factory=deque)
+    tool_calls: Deque[ToolCall] = field(default_factory=deque)
+    # Bumped on every new message; the length stops changing once the deque is full
+    version: int = 0
+    # Sum of the estimated tokens of the messages currently in the history
+    token_count: int = 0
 
 class ContextManager:
     """
@@ -41,15 +77,49 @@ class ContextManager:
     4. Managing context window size
     """
     
-    def __init__(self, max_history_length: int = 10):
+    def __init__(self, 
+                 max_history_length: int = 10, 
+                 max_tool_calls: int = 20,
+                 max_tokens: int = 4096):
         """
         Initialize the context manager.
         
         Args:
             max_history_length: Maximum number of messages to keep in history
+            max_tool_calls: Maximum number of tool calls to keep in history
+            max_tokens: Token budget for the system message plus history; the
+                oldest messages are dropped once it is exceeded
         """
         self.conversations: Dict[str, ConversationContext] = {}
         self.max_history_length = max_history_length
+        self.max_tool_calls = max_tool_calls
+        self.max_tokens = max_tokens
+        # The base system message never changes, so measure it once
+        self._system_tokens = estimate_tokens(_SYSTEM_MESSAGE_BASE)
+        # Reference pair for mapping monotonic record timestamps to wall-clock time
+        self._epoch_mono = time.monotonic_ns()
+        self._epoch_wall = time.time()
+        # conversation_id -> (version, include_system, formatted history)
+        self._history_cache: Dict[str, Tuple[int, bool, str]] = {}
+    
+    def to_datetime(self, timestamp_ns: int) -> datetime:
+        """
+        Convert a record's monotonic timestamp to a wall-clock datetime.
+        
+        Args:
+            timestamp_ns: Value of time.monotonic_ns() when the record was created
+            
+        Returns:
+            Local datetime corresponding to the timestamp
+        """
+        return datetime.fromtimestamp(self._epoch_wall + (timestamp_ns - self._epoch_mono) * 1e-9)
+    
+    def _new_context(self) -> ConversationContext:
+        """Create an empty conversation context with bounded histories."""
+        return ConversationContext(
+            messages=deque(maxlen=self.max_history_length),
+            tool_calls=deque(maxlen=self.max_tool_calls)
+        )
     
     def create_conversation(self, conversation_id: str) -> None:
         """
@@ -61,9 +131,23 @@ class ContextManager:
         if conversation_id in self.conversations:
             logger.warning(f"Conversation {conversation_id} already exists. Overwriting.")
             
-        self.conversations[conversation_id] = ConversationContext()
+        self.conversations[conversation_id] = self._new_context()
+        self._history_cache.pop(conversation_id, None)
         logger.info(f"Created new conversation with ID: {conversation_id}")
     
+    def has_history(self, conversation_id: str) -> bool:
+        """
+        Check whether a conversation exists and already contains messages.
+        
+        Args:
+            conversation_id: Conversation ID
+            
+        Returns:
+            True if the conversation has at least one message
+        """
+        conversation = self.conversations.get(conversation_id)
+        return conversation is not None and len(conversation.messages) > 0
+    
     def add_message(self, conversation_id: str, role: str, content: str) -> None:
         """
         Add a message to the conversation history.
@@ -76,12 +160,24 @@ class ContextManager:
         if conversation_id not in self.conversations:
             self.create_conversation(conversation_id)
             
-        message = Message(role=role, content=content)
-        self.conversations[conversation_id].messages.append(message)
+        message = Message(
+            role=role,
+            content=content,
+            tokens=estimate_tokens(f"{role.capitalize()}: {content}\n\n")
+        )
+        conversation = self.conversations[conversation_id]
+        messages = conversation.messages
+        
+        # The bounded deque drops the oldest message once the history is full
+        if len(messages) == messages.maxlen:
+            conversation.token_count -= messages[0].tokens
+        messages.append(message)
+        conversation.token_count += message.tokens
+        conversation.version += 1
         
-        # Trim history if it exceeds max length
-        if len(self.conversations[conversation_id].messages) > self.max_history_length:
-            self.conversations[conversation_id].messages.pop(0)
+        # Then trim by token budget, always keeping the newest message
+        while len(messages) > 1 and conversation.token_count + self._system_tokens > self.max_tokens:
+            conversation.token_count -= messages.popleft().tokens
             
         logger.debug(f"Added {role} message to conversation {conversation_id}")
     
@@ -129,23 +225,37 @@ class ContextManager:
             logger.warning(f"Conversation {conversation_id} not found")
             return ""
             
-        history = ""
-        for message in self.conversations[conversation_id].messages:
-            if not include_system and message.role == "system":
-                continue
-                
-            history += f"{message.role.capitalize()}: {message.content}\n\n"
+        conversation = self.conversations[conversation_id]
+        cached = self._history_cache.get(conversation_id)
+        if cached and cached[0] == conversation.version and cached[1] == include_system:
+            return cached[2]
             
-        return history.strip()
+        history = "\n\n".join(
+            f"{message.role.capitalize()}: {message.content}"
+            for message in conversation.messages
+            if include_system or message.role != "system"
+        ).strip()
+        
+        self._history_cache[conversation_id] = (conversation.version, include_system, history)
+        return history
     
-    def get_tool_context(self, conversation_id: str, recent_only: bool = True, max_tools: int = 5) -> str:
+    def get_tool_context(self, 
+                         conversation_id: str, 
+                         recent_only: bool = True, 
+                         max_tools: int = 5,
+                         max_chars: int = 2000) -> str:
         """
         Get context about recent tool calls.
         
+        Each call is rendered on one line as name(parameters) -> result, with
+        parameters and results as compact JSON. When the lines exceed
+        max_chars, the oldest calls are dropped first.
+        
         Args:
             conversation_id: Conversation ID
             recent_only: Whether to include only recent tool calls
             max_tools: Maximum number of tool calls to include
+            max_chars: Character budget for the rendered tool calls
             
         Returns:
             Formatted tool context
@@ -157,25 +267,28 @@ class ContextManager:
         tool_calls = self.conversations[conversation_id].tool_calls
         
         if recent_only:
-            tool_calls = tool_calls[-max_tools:] if tool_calls else []
+            tool_calls = list(islice(tool_calls, max(len(tool_calls) - max_tools, 0), None))
             
-        context = "Recent tool calls:\n"
-        
         if not tool_calls:
             return ""
             
-        for call in tool_calls:
-            context += f"- Tool: {call.tool_name}\n"
-            context += f"  Parameters: {call.parameters}\n"
-            
+        # Walk from newest to oldest so the budget keeps the most recent calls
+        lines = []
+        used = 0
+        for call in reversed(tool_calls):
+            line = f"- {call.tool_name}({_compact_json(call.parameters)})"
             if call.result is not None:
-                context += f"  Result: {call.result}\n"
+                line += f" -> {_compact_json(call.result)}"
             elif call.error is not None:
-                context += f"  Error: {call.error}\n"
+                line += f" -> error: {call.error}"
                 
-            context += "\n"
+            used += len(line) + 1
+            if lines and used > max_chars:
+                break
+            lines.append(line)
             
-        return context
+        lines.append("Recent tool calls:")
+        return "\n".join(reversed(lines)) + "\n"
     
     def clear_conversation(self, conversation_id: str) -> None:
         """
@@ -185,7 +298,8 @@ class ContextManager:
             conversation_id: Conversation ID to clear
         """
         if conversation_id in self.conversations:
-            self.conversations[conversation_id] = ConversationContext()
+            self.conversations[conversation_id] = self._new_context()
+            self._history_cache.pop(conversation_id, None)
             logger.info(f"Cleared conversation {conversation_id}")
         else:
             logger.warning(f"Attempted to clear nonexistent conversation {conversation_id}")
@@ -199,6 +313,7 @@ class ContextManager:
         """
         if conversation_id in self.conversations:
             del self.conversations[conversation_id]
+            self._history_cache.pop(conversation_id, None)
             logger.info(f"Deleted conversation {conversation_id}")
         else:
             logger.warning(f"Attempted to delete nonexistent conversation {conversation_id}")
@@ -206,14 +321,24 @@ class ContextManager:
     def get_full_context(self, 
                        conversation_id: str, 
                        user_input: str,
-                       tools: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+                       tools: List[Dict[str, Any]] = None,
+                       append: bool = True) -> Dict[str, Any]:
         """
         Get the full context for an LLM prompt, including conversation history and available tools.
         
+        The returned system message always starts with the same
+        _SYSTEM_MESSAGE_BASE bytes; only the recent tool calls are appended
+        after it. Keep it that way: Ollama reuses the KV cache for an
+        identical prompt prefix while the model stays loaded (see the
+        connector's keep_alive), so edits that vary the start of the system
+        message force a full re-evaluation on every turn.
+        
         Args:
             conversation_id: Conversation ID
             user_input: Current user input
             tools: List of available tools
+            append: Whether to record user_input as a new user message; pass False
+                when rebuilding the context for a turn that was already recorded
             
         Returns:
             Dictionary with prompt, system_message, and tools context
@@ -223,7 +348,8 @@ class ContextManager:
             self.create_conversation(conversation_id)
             
         # Add the current user input to history
-        self.add_message(conversation_id, "user", user_input)
+        if append:
+            self.add_message(conversation_id, "user", user_input)
         
         # Get conversation history
         history = self.get_formatted_history(conversation_id)
@@ -231,19 +357,8 @@ class ContextManager:
         # Get tool context
         tool_context = self.get_tool_context(conversation_id)
         
-        # System message that instructs the model
-        system_message = (
-            "You are a  smart AI assistant with access to tools. "
-            "Use these tools when appropriate to fulfill user requests. "
-            "Always be helpful, accurate, and concise. "
-            "IMPORTANT: You must remember all previously shared information within the conversation. "
-            "If the user shares their name or preferences, remember this information for the duration of the conversation."
-        )
-        
-        
         # If we have tool context, add it to the system message
-        if tool_context:
-            system_message += f"\n\n{tool_context}"
+        system_message = f"{_SYSTEM_MESSAGE_BASE}\n\n{tool_context}" if tool_context else _SYSTEM_MESSAGE_BASE
             
         return {
             "conversation_history": history,
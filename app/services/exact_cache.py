@@ -0,0 +1,136 @@
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def prompt_key(prompt: str) -> bytes:
+    """
+    Hash a prompt into a compact cache key.
+
+    Args:
+        prompt: Prompt text
+
+    Returns:
+        16-byte blake2b digest of the prompt
+    """
+    return hashlib.blake2b(prompt.encode(), digest_size=16).digest()
+
+class LRUCache:
+    """
+    Exact-match cache of responses keyed by prompt text.
+
+    Keys are fixed-size blake2b digests of the prompt, so long prompts
+    don't stay referenced by the cache. The least recently used entry is
+    evicted once the cache is full.
+    """
+
+    def __init__(self, maxsize: int = 1024):
+        """
+        Initialize the LRU cache.
+
+        Args:
+            maxsize: Maximum number of entries to keep
+        """
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[bytes, Dict[str, Any]]" = OrderedDict()
+
+    def get(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up the response stored for a prompt.
+
+        Args:
+            prompt: Prompt to look up
+
+        Returns:
+            The cached response, or None on a miss
+        """
+        key = prompt_key(prompt)
+        response = self._entries.get(key)
+        if response is not None:
+            self._entries.move_to_end(key)
+        return response
+
+    def put(self, prompt: str, response: Dict[str, Any]) -> None:
+        """
+        Store a response for a prompt.
+
+        Args:
+            prompt: Prompt the response was generated for
+            response: Response payload to return on future hits
+        """
+        key = prompt_key(prompt)
+        self._entries[key] = response
+        self._entries.move_to_end(key)
+
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all cached entries."""
+        self._entries.clear()
+
+class TTLCache:
+    """
+    Bounded cache whose entries expire a fixed time after being stored.
+
+    Used for values that change slowly but not never, such as Tool
+    Manager lookups. Expired entries are dropped lazily on access, and
+    the oldest entry is evicted once the cache is full.
+    """
+
+    def __init__(self, maxsize: int = 512, ttl: float = 300.0):
+        """
+        Initialize the TTL cache.
+
+        Args:
+            maxsize: Maximum number of entries to keep
+            ttl: Lifetime of an entry in seconds
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Look up a value that has not expired yet.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            The cached value, or None on a miss or after expiry
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value, resetting its expiry time.
+
+        Args:
+            key: Cache key
+            value: Value to store
+        """
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Check whether a key holds a value that has not expired."""
+        return self.get(key) is not None
+
+    def clear(self) -> None:
+        """Remove all cached entries."""
+        self._entries.clear()
@@ -1,20 +1,148 @@
+import asyncio
+import hashlib
 import json
 import logging
+import os
 import httpx
-from typing import Dict, Any, Optional, List
+import orjson
+from collections import OrderedDict
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, Any, Optional, List
 
 logger = logging.getLogger(__name__)
 
+_DECODER = json.JSONDecoder()
+
+def _iter_json_objects(text: str):
+    """
+    Yield every JSON object that can be decoded from a text.
+    
+    Each candidate '{' is handed to the C decoder's raw_decode, which
+    returns the object and where it ended, so scanning resumes after it
+    instead of walking the text character by character.
+    
+    Args:
+        text: Text that may contain one or more JSON objects
+        
+    Yields:
+        Decoded JSON objects, in order
+    """
+    i = text.find("{")
+    while i != -1:
+        try:
+            obj, end = _DECODER.raw_decode(text, i)
+        except json.JSONDecodeError:
+            i = text.find("{", i + 1)
+            continue
+        if isinstance(obj, dict):
+            yield obj
+        i = text.find("{", end)
+
+async def _aiter_byte_lines(response: httpx.Response) -> AsyncIterator[bytes]:
+    """
+    Yield the lines of a streamed response body as bytes.
+    
+    Unlike Response.aiter_lines, nothing is decoded to str; NDJSON lines
+    only ever go to orjson, which reads bytes directly.
+    
+    Args:
+        response: Streaming response to read
+        
+    Yields:
+        Each line without its trailing newline
+    """
+    pending = b""
+    async for data in response.aiter_bytes():
+        lines = (pending + data).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+# Used when the caller doesn't provide a system message
+_DEFAULT_SYSTEM_MESSAGE = (
+    "You are an AI assistant with access to tools. "
+    "Use these tools when appropriate to fulfill user requests. "
+    "Always be helpful, accurate, and concise. "
+    "IMPORTANT: You must remember all previously shared information within the conversation. "
+    "If the user shares their name or preferences, remember this information for the duration of the conversation."
+)
+
+_TOOLS_HEADER = "Available tools:\n"
+
+# Response format the model is instructed to follow on every turn
+_FORMATTING_INSTRUCTIONS = (
+    "\nYou MUST format ALL your responses as valid JSON objects with this structure:\n"
+    "```json\n"
+    "{\n"
+    "    \"response\": \"your helpful response text here\",\n"
+    "    \"tool_call\": null\n"
+    "}\n"
+    "```\n"
+    "When using a tool, set tool_call to a valid object like:\n"
+    "```json\n"
+    "{\n"
+    "    \"response\": \"I'll check that for you\",\n"
+    "    \"tool_call\": {\n"
+    "        \"name\": \"tool_name\",\n"
+    "        \"parameters\": {\n"
+    "            \"param1\": \"value1\"\n"
+    "        }\n"
+    "    }\n"
+    "}\n"
+    "```\n"
+    "To use several independent tools at once, set tool_call to a list of such objects:\n"
+    "```json\n"
+    "{\n"
+    "    \"response\": \"I'll check both for you\",\n"
+    "    \"tool_call\": [\n"
+    "        {\"name\": \"tool_a\", \"parameters\": {\"param1\": \"value1\"}},\n"
+    "        {\"name\": \"tool_b\", \"parameters\": {\"param1\": \"value2\"}}\n"
+    "    ]\n"
+    "}\n"
+    "```\n"
+    "ALWAYS respond in this JSON format. NEVER respond in plain text."
+)
+
+# Deterministic (temperature 0) responses are cached unless disabled here
+RESPONSE_CACHE_ENABLED = os.environ.get("OLLAMA_RESPONSE_CACHE", "true").lower() == "true"
+# Maximum number of requests in flight to Ollama; the rest wait client-side
+MAX_CONCURRENCY = int(os.environ.get("OLLAMA_MAX_CONCURRENCY", "4"))
+
 class OllamaConnector:
     """
     Connector for the Ollama LLM service.
     Handles communication with local Ollama instance.
     """
     
+    # Fixed attribute set: slot access on the hot path and no stray attributes
+    __slots__ = (
+        "base_url",
+        "model",
+        "timeout",
+        "keep_alive",
+        "_generate_url",
+        "_headers",
+        "_base_payload",
+        "client",
+        "_semaphore",
+        "cache_enabled",
+        "_cache",
+        "_cache_max",
+        "stats",
+        "_sys_prompt_cache",
+        "_sys_prompt_cache_max",
+    )
+    
     def __init__(self, 
                  base_url: str = "http://localhost:11434",
                  model: str = "gemma3",
-                 timeout: int = 120):
+                 timeout: int = 120,
+                 keep_alive: str = "30m",
+                 cache_enabled: bool = RESPONSE_CACHE_ENABLED,
+                 cache_size: int = 1024,
+                 max_concurrency: int = MAX_CONCURRENCY):
         """
         Initialize the Ollama connector.
         
@@ -22,12 +150,153 @@ class OllamaConnector:
             base_url: Base URL for the Ollama API
             model: Default model to use (gemma3 by default)
             timeout: Request timeout in seconds
+            keep_alive: How long Ollama keeps the model (and its KV cache) loaded
+                after a request, e.g. "30m"
+            cache_enabled: Whether to cache responses generated with temperature 0
+            cache_size: Maximum number of cached responses
+            max_concurrency: Maximum number of concurrent requests to Ollama
         """
         self.base_url = base_url
         # Handle model names that may include version (like gemma3:12b)
         self.model = model
         self.timeout = timeout
-        self.client = httpx.AsyncClient(timeout=timeout)
+        self.keep_alive = keep_alive
+        # Request pieces that never change between calls, built once
+        self._generate_url = f"{base_url}/api/generate"
+        self._headers = {"content-type": "application/json", "accept": "application/x-ndjson"}
+        self._base_payload = {
+            "model": model,
+            # Keep the model resident so Ollama can reuse the KV cache of the
+            # unchanged system prompt prefix on the next request
+            "keep_alive": keep_alive,
+            "stream": True,
+        }
+        # Keep connections to Ollama alive across turns; retries only cover
+        # failed connection attempts, never a request Ollama has received
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            transport=httpx.AsyncHTTPTransport(
+                retries=1,
+                limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+            )
+        )
+        # Ollama only runs a few generations at once; queueing here instead of
+        # on the server keeps fan-out (generate_batch, concurrent /process
+        # requests) from inflating tail latency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Exact-match cache for deterministic requests, keyed by payload hash
+        self.cache_enabled = cache_enabled
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._cache_max = cache_size
+        self.stats = {"hits": 0, "misses": 0}
+        # Assembled system prompts keyed by a digest of (tools, system message)
+        self._sys_prompt_cache: "OrderedDict[bytes, str]" = OrderedDict()
+        self._sys_prompt_cache_max = 128
+    
+    def _build_payload(self, 
+                       prompt: str,
+                       system_prompt: Optional[str],
+                       temperature: float,
+                       max_tokens: Optional[int]) -> Dict[str, Any]:
+        """Build the /api/generate request body."""
+        # Ollama only reads sampling settings from "options"; top-level
+        # temperature or max_tokens fields are silently ignored
+        options: Dict[str, Any] = {"temperature": temperature}
+        if max_tokens:
+            options["num_predict"] = max_tokens
+            
+        payload = {**self._base_payload, "prompt": prompt, "options": options}
+        
+        if system_prompt:
+            payload["system"] = system_prompt
+            
+        return payload
+    
+    def _cache_key(self, payload: Dict[str, Any]) -> Optional[str]:
+        """
+        Get the cache key for a request, or None if it must not be cached.
+        
+        Only deterministic requests (temperature <= 0) are cacheable; with
+        sampling enabled, repeating the request is expected to vary.
+        """
+        if not self.cache_enabled or payload["options"]["temperature"] > 0.0:
+            return None
+            
+        canonical = orjson.dumps(
+            {key: payload.get(key) for key in ("model", "prompt", "system", "options")},
+            option=orjson.OPT_SORT_KEYS
+        )
+        return hashlib.sha256(canonical).hexdigest()
+    
+    async def _stream_chunks(self, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Send a streaming generate request and yield the decoded NDJSON chunks.
+        
+        Args:
+            payload: Request body from _build_payload
+            
+        Yields:
+            One dictionary per streamed chunk
+        """
+        # Lazy %-formatting: nothing is rendered unless debug logging is on,
+        # and only the head of the (possibly multi-KB) prompt is logged
+        logger.debug(
+            "Sending request to Ollama API: model=%s prompt_len=%d prompt=%.200r",
+            payload["model"], len(payload["prompt"]), payload["prompt"]
+        )
+        # orjson emits bytes directly, so httpx doesn't have to encode the body
+        async with self._semaphore, self.client.stream(
+            "POST",
+            self._generate_url,
+            content=orjson.dumps(payload),
+            headers=self._headers
+        ) as response:
+            if response.is_error:
+                # Load the body so the error handlers can log it
+                await response.aread()
+            response.raise_for_status()
+            
+            # Lines stay bytes: orjson parses them without a str decode step
+            async for line in _aiter_byte_lines(response):
+                if not line.strip():
+                    continue
+                try:
+                    yield orjson.loads(line)
+                except orjson.JSONDecodeError as e:
+                    # Recover what we can, e.g. two chunks glued onto one line;
+                    # only this rare path pays for decoding the line
+                    logger.error("Error parsing streamed chunk from Ollama API: %s", e)
+                    logger.debug("Raw chunk content: %r", line)
+                    for chunk in _iter_json_objects(line.decode("utf-8", errors="replace")):
+                        yield chunk
+    
+    async def generate_response_stream(self, 
+                                 prompt: str,
+                                 system_prompt: Optional[str] = None,
+                                 temperature: float = 0.7,
+                                 max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Generate a response using the Ollama API, yielding text as it arrives.
+        
+        Args:
+            prompt: The user prompt to send to the model
+            system_prompt: Optional system prompt to guide the model's behavior
+            temperature: Controls randomness (0 = deterministic, 1 = creative)
+            max_tokens: Maximum number of tokens to generate
+            
+        Yields:
+            Partial response text, in order
+        """
+        payload = self._build_payload(prompt, system_prompt, temperature, max_tokens)
+        
+        # Closing the chunk stream releases the connection and the semaphore
+        # as soon as we stop, even if the consumer abandons this generator
+        async with aclosing(self._stream_chunks(payload)) as chunks:
+            async for chunk in chunks:
+                if "error" in chunk:
+                    raise RuntimeError(f"Ollama API error: {chunk['error']}")
+                if chunk.get("response"):
+                    yield chunk["response"]
     
     async def generate_response(self, 
                           prompt: str,
@@ -37,6 +306,9 @@ class OllamaConnector:
         """
         Generate a response using the Ollama API.
         
+        The response is streamed and the text is collected as chunks arrive,
+        so the body is never buffered and parsed as a whole.
+        
         Args:
             prompt: The user prompt to send to the model
             system_prompt: Optional system prompt to guide the model's behavior
@@ -46,78 +318,127 @@ class OllamaConnector:
         Returns:
             Dictionary containing the model's response
         """
-        url = f"{self.base_url}/api/generate"
+        payload = self._build_payload(prompt, system_prompt, temperature, max_tokens)
         
-        payload = {
-            "model": self.model,
-            "prompt": prompt,
-            "temperature": temperature,
-            "stream": False,  # Ensure streaming is disabled to get a complete response
-        }
-        
-        if system_prompt:
-            payload["system"] = system_prompt
-            
-        if max_tokens:
-            payload["max_tokens"] = max_tokens
+        cache_key = self._cache_key(payload)
+        if cache_key is not None:
+            cached = self._cache.get(cache_key)
+            if cached is not None:
+                self._cache.move_to_end(cache_key)
+                self.stats["hits"] += 1
+                logger.debug("Serving deterministic Ollama response from cache")
+                return dict(cached)
+            self.stats["misses"] += 1
         
         try:
-            # print(f"Sending request to Ollama API: {payload}")
-            logger.debug(f"Sending request to Ollama API: {payload}")
-            response = await self.client.post(url, json=payload)
-            response.raise_for_status()
+            parts = []
+            final: Dict[str, Any] = {}
             
-            # Parse the response safely
-            try:
-                result = response.json()
-                logger.debug(f"Received response from Ollama API: {result}")
-                return result
-            except json.JSONDecodeError as e:
-                # Handle malformed JSON
-                logger.error(f"Error parsing JSON from Ollama API: {str(e)}")
-                logger.debug(f"Raw response content: {response.content}")
-                
-                # Try to extract only the first valid JSON object if there are multiple
-                content = response.content.decode('utf-8')
-                if '{' in content and '}' in content:
-                    try:
-                        # Find the first complete JSON object
-                        start = content.find('{')
-                        # Find the matching closing brace
-                        depth = 0
-                        for i, char in enumerate(content[start:], start):
-                            if char == '{':
-                                depth += 1
-                            elif char == '}':
-                                depth -= 1
-                                if depth == 0:
-                                    end = i + 1
-                                    break
+            # Returning early on an error chunk must not leave the stream (and
+            # its connection and semaphore slot) open until garbage collection
+            async with aclosing(self._stream_chunks(payload)) as chunks:
+                async for chunk in chunks:
+                    if "error" in chunk:
+                        logger.error("Ollama API returned an error: %s", chunk["error"])
+                        return {
+                            "response": "I'm sorry, I encountered an error processing your request.",
+                            "error": chunk["error"]
+                        }
                         
-                        # Extract and parse the first JSON object
-                        json_str = content[start:end]
-                        result = json.loads(json_str)
-                        logger.debug(f"Successfully extracted JSON: {result}")
-                        return result
-                    except Exception as inner_e:
-                        logger.error(f"Failed to extract valid JSON: {str(inner_e)}")
-                
-                # If all parsing attempts fail, return a basic response
-                return {
-                    "response": "I'm sorry, I encountered an error processing your request.",
-                    "error": str(e)
-                }
+                    parts.append(chunk.get("response", ""))
+                    if chunk.get("done"):
+                        final = chunk
+            
+            # The final chunk carries the stats (durations, token counts) but no text
+            result = {**final, "response": "".join(parts)}
+            logger.debug(
+                "Received response from Ollama API: response_len=%d eval_count=%s",
+                len(result["response"]), result.get("eval_count")
+            )
+            
+            # A stream that ended without its done chunk was cut short
+            if cache_key is not None and final:
+                self._cache[cache_key] = dict(result)
+                if len(self._cache) > self._cache_max:
+                    self._cache.popitem(last=False)
+            return result
             
         except httpx.HTTPStatusError as e:
-            logger.error(f"HTTP error during Ollama API call: {e.response.status_code} - {e.response.text}")
+            logger.error("HTTP error during Ollama API call: %s - %s", e.response.status_code, e.response.text)
             raise
         except httpx.RequestError as e:
-            logger.error(f"Request error during Ollama API call: {str(e)}")
+            logger.error("Request error during Ollama API call: %s", e)
             raise
         except Exception as e:
-            logger.error(f"Unexpected error during Ollama API call: {str(e)}")
+            logger.error("Unexpected error during Ollama API call: %s", e)
             raise
     
+    async def generate_batch(self, 
+                             prompts: List[str],
+                             system_prompt: Optional[str] = None,
+                             temperature: float = 0.7,
+                             max_tokens: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Generate responses for several independent prompts concurrently.
+        
+        The requests are issued together, so the total latency is that of the
+        slowest one rather than the sum of all of them.
+        
+        Args:
+            prompts: The prompts to send to the model
+            system_prompt: Optional system prompt shared by all prompts
+            temperature: Controls randomness (0 = deterministic, 1 = creative)
+            max_tokens: Maximum number of tokens to generate per prompt
+            
+        Returns:
+            List of response dictionaries, in the same order as prompts
+        """
+        return await asyncio.gather(*(
+            self.generate_response(prompt, system_prompt, temperature, max_tokens)
+            for prompt in prompts
+        ))
+    
+    def _build_system_prompt(self, 
+                             tools: List[Dict[str, Any]],
+                             system_message: Optional[str]) -> str:
+        """
+        Assemble the system prompt from the system message, tools and format rules.
+        
+        The result is cached per (tools, system message) pair, so a stable tool
+        registry doesn't re-render the same multi-KB prompt on every turn.
+        
+        Args:
+            tools: List of tool definitions to include in the context
+            system_message: System message from context manager
+            
+        Returns:
+            The final system prompt
+        """
+        fingerprint = hashlib.blake2b(
+            orjson.dumps(tools, option=orjson.OPT_SORT_KEYS) + (system_message or "").encode(),
+            digest_size=16
+        ).digest()
+        cached = self._sys_prompt_cache.get(fingerprint)
+        if cached is not None:
+            self._sys_prompt_cache.move_to_end(fingerprint)
+            return cached
+        
+        # Collect the prompt pieces and join them once instead of growing a string
+        parts = [system_message or _DEFAULT_SYSTEM_MESSAGE, "\n\n", _TOOLS_HEADER]
+        for tool in tools:
+            parts.append(f"- {tool['name']}: {tool['description']}\n  Parameters: ")
+            parts.append(orjson.dumps(tool["parameters"]).decode())
+            parts.append("\n\n")
+        parts.append("\n")
+        parts.append(_FORMATTING_INSTRUCTIONS)
+        
+        final_system_prompt = "".join(parts)
+        
+        self._sys_prompt_cache[fingerprint] = final_system_prompt
+        if len(self._sys_prompt_cache) > self._sys_prompt_cache_max:
+            self._sys_prompt_cache.popitem(last=False)
+        return final_system_prompt
+    
     async def generate_with_tool_context(self, 
                                    prompt: str, 
                                    tools: List[Dict[str, Any]],
@@ -135,48 +456,7 @@ class OllamaConnector:
         Returns:
             Dictionary containing the model's response
         """
-        # Format the tool descriptions for the model
-        tools_context = "Available tools:\n"
-        for tool in tools:
-            tools_context += f"- {tool['name']}: {tool['description']}\n"
-            tools_context += f"  Parameters: {json.dumps(tool['parameters'])}\n\n"
-        
-        # Use provided system message or create a default one
-        if not system_message:
-            system_message = (
-                "You are an AI assistant with access to tools. "
-                "Use these tools when appropriate to fulfill user requests. "
-                "Always be helpful, accurate, and concise. "
-                "IMPORTANT: You must remember all previously shared information within the conversation. "
-                "If the user shares their name or preferences, remember this information for the duration of the conversation."
-            )
-        
-        # Add specific formatting instructions
-        formatting_instructions = (
-            "\nYou MUST format ALL your responses as valid JSON objects with this structure:\n"
-            "```json\n"
-            "{\n"
-            "    \"response\": \"your helpful response text here\",\n"
-            "    \"tool_call\": null\n"
-            "}\n"
-            "```\n"
-            "When using a tool, set tool_call to a valid object like:\n"
-            "```json\n"
-            "{\n"
-            "    \"response\": \"I'll check that for you\",\n"
-            "    \"tool_call\": {\n"
-            "        \"name\": \"tool_name\",\n"
-            "        \"parameters\": {\n"
-            "            \"param1\": \"value1\"\n"
-            "        }\n"
-            "    }\n"
-            "}\n"
-            "```\n"
-            "ALWAYS respond in this JSON format. NEVER respond in plain text."
-        )
-        
-        # Combine system message with tools context and formatting instructions
-        final_system_prompt = f"{system_message}\n\n{tools_context}\n{formatting_instructions}"
+        final_system_prompt = self._build_system_prompt(tools, system_message)
         
         # Format the final prompt with conversation history
         final_prompt = prompt
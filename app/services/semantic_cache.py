@@ -0,0 +1,66 @@
+import logging
+from typing import Any, Dict, Optional
+
+from app.services.exact_cache import TTLCache, prompt_key
+
+logger = logging.getLogger(__name__)
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Reduce a prompt to the form used as its cache key.
+
+    Only leading and trailing whitespace is dropped. Case, punctuation and
+    inner spacing are kept: the agent's tools change case and spacing, so
+    "Capitalize 'JOHN SMITH'" and "Capitalize 'john smith'" have
+    different answers.
+
+    Args:
+        prompt: Prompt text
+
+    Returns:
+        The prompt without surrounding whitespace
+    """
+    return prompt.strip()
+
+class SemanticCache(TTLCache):
+    """
+    Cache of agent responses for prompts that are equal up to surrounding whitespace.
+
+    Entries expire after a fixed time, so an answer that depended on the
+    model or tool catalog of the moment isn't served forever.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 600.0):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of prompts to keep (oldest are evicted)
+            ttl: Lifetime of an entry in seconds
+        """
+        super().__init__(maxsize=max_entries, ttl=ttl)
+
+    def get(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up the response stored for an equivalent prompt.
+
+        Args:
+            prompt: Prompt to look up
+
+        Returns:
+            The cached response, or None on a miss or after expiry
+        """
+        response = super().get(prompt_key(normalize_prompt(prompt)))
+        if response is not None:
+            logger.debug(f"Normalized cache hit for prompt: {prompt}")
+        return response
+
+    def put(self, prompt: str, response: Dict[str, Any]) -> None:
+        """
+        Store a response for a prompt.
+
+        Args:
+            prompt: Prompt the response was generated for
+            response: Response payload to return on future hits
+        """
+        super().put(prompt_key(normalize_prompt(prompt)), response)
@@ -1,8 +1,20 @@
 import logging
+import re
 from typing import Dict, Any
 
 logger = logging.getLogger(__name__)
 
+# A word is any run of non-whitespace characters, as with str.split()
+_WORD_RE = re.compile(r"\S+")
+
+# Supported format types mapped to the str method implementing them
+_FORMATTERS = {
+    "upper": str.upper,
+    "lower": str.lower,
+    "title": str.title,
+    "capitalize": str.capitalize,
+}
+
 async def format_text(text: str, format_type: str) -> Dict[str, Any]:
     """
     Format text according to the specified format type.
@@ -17,18 +29,11 @@ async def format_text(text: str, format_type: str) -> Dict[str, Any]:
     logger.info(f"Formatting text with format_type: {format_type}")
     
     try:
-        if format_type == "upper":
-            result = text.upper()
-        elif format_type == "lower":
-            result = text.lower()
-        elif format_type == "title":
-            result = text.title()
-        elif format_type == "capitalize":
-            result = text.capitalize()
-        else:
+        formatter = _FORMATTERS.get(format_type)
+        if formatter is None:
             return {"error": f"Unsupported format type: {format_type}"}
             
-        return {"formatted_text": result}
+        return {"formatted_text": formatter(text)}
         
     except Exception as e:
         logger.error(f"Error formatting text: {str(e)}")
@@ -47,27 +52,30 @@ async def count_words(text: str) -> Dict[str, Any]:
     logger.info(f"Counting words in text of length: {len(text)}")
     
     try:
-        # Split the text and count words
-        words = text.split()
-        word_count = len(words)
-        
-        # Count unique words
-        unique_words = len(set(words))
-        
-        # Find longest and shortest words
-        if words:
-            longest_word = max(words, key=len)
-            shortest_word = min(words, key=len)
-        else:
-            longest_word = ""
-            shortest_word = ""
+        # Scan the words lazily instead of building a list with str.split(),
+        # gathering every statistic in the same pass
+        word_count = 0
+        seen = set()
+        total_length = 0
+        longest_word = shortest_word = ""
+        longest_length, shortest_length = -1, float("inf")
+        for match in _WORD_RE.finditer(text):
+            word = match.group()
+            word_count += 1
+            seen.add(word)
+            length = match.end() - match.start()
+            total_length += length
+            if length > longest_length:
+                longest_word, longest_length = word, length
+            if length < shortest_length:
+                shortest_word, shortest_length = word, length
             
         return {
             "total_words": word_count,
-            "unique_words": unique_words,
+            "unique_words": len(seen),
             "longest_word": longest_word,
             "shortest_word": shortest_word,
-            "average_word_length": sum(len(word) for word in words) / max(word_count, 1)
+            "average_word_length": total_length / max(word_count, 1)
         }
         
     except Exception as e:
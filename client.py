@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 import os
+import sys
 import json
 import argparse
 import httpx
+import orjson
 import asyncio
 from rich.console import Console
 from rich.markdown import Markdown
@@ -12,14 +14,24 @@ from rich.panel import Panel
 DEFAULT_API_URL = "http://localhost:8080"
 # File to store conversation ID for persistence between sessions
 CONVERSATION_STORE = "conversation_store.json"
+# Connection pool for the session's client; one connection is reused across turns
+HTTP_LIMITS = httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+
+# Conversation ID of the running session, written to disk once on exit
+session_state = {"conversation_id": None}
 
 console = Console()
 
-async def process_input(api_url, user_input, conversation_id=None, debug=False):
+def pretty_json(value):
+    """Render a value as indented JSON for display."""
+    return orjson.dumps(value, option=orjson.OPT_INDENT_2).decode()
+
+async def process_input(client, api_url, user_input, conversation_id=None, debug=False):
     """
     Send user input to the agent API and return the response.
     
     Args:
+        client: Shared HTTP client for the session
         api_url: API endpoint URL
         user_input: User's input text
         conversation_id: Optional conversation ID for continuing a conversation
@@ -37,21 +49,22 @@ async def process_input(api_url, user_input, conversation_id=None, debug=False):
     # DEBUG: Show payload being sent to API
     if debug:
         console.print("[bold cyan]DEBUG - Sending payload:[/]")
-        console.print(json.dumps(payload, indent=2))
+        console.print(pretty_json(payload))
         
     try:
-        async with httpx.AsyncClient(timeout=120.0) as client:
-            # Add a debug header only if debug mode is enabled
-            headers = {"X-Debug-Mode": "true"} if debug else {}
-            response = await client.post(url, json=payload, headers=headers)
-            response.raise_for_status()
-            
-            # DEBUG: Show raw response from API
-            if debug:
-                console.print("[bold cyan]DEBUG - Raw API response:[/]")
-                console.print(json.dumps(response.json(), indent=2))
-            
-            return response.json()
+        # Add a debug header only if debug mode is enabled
+        headers = {"X-Debug-Mode": "true"} if debug else {}
+        headers["Content-Type"] = "application/json"
+        response = await client.post(url, content=orjson.dumps(payload), headers=headers)
+        response.raise_for_status()
+        result = orjson.loads(response.content)
+        
+        # DEBUG: Show raw response from API
+        if debug:
+            console.print("[bold cyan]DEBUG - Raw API response:[/]")
+            console.print(pretty_json(result))
+        
+        return result
     except httpx.HTTPStatusError as e:
         console.print(f"[bold red]HTTP Error:[/] {e.response.status_code} - {e.response.text}")
         return None
@@ -78,16 +91,20 @@ def save_conversation_id(conversation_id):
     except Exception as e:
         console.print(f"[bold yellow]Warning:[/] Could not save conversation: {str(e)}")
 
-async def interactive_session(api_url, debug=False):
+async def interactive_session(api_url, debug=False, plain=False):
     """
     Start an interactive session with the agent.
     
     Args:
         api_url: API endpoint URL
         debug: Whether to enable debug mode
+        plain: Print responses as plain text instead of rendering Markdown
     """
+    loop = asyncio.get_running_loop()
+    
     # Load existing conversation ID if available
     conversation_id = load_conversation_id()
+    session_state["conversation_id"] = conversation_id
     
     # Show message if continuing existing conversation
     if conversation_id:
@@ -98,47 +115,61 @@ async def interactive_session(api_url, debug=False):
         subtitle="Type 'exit' to quit, 'new' for new conversation"
     ))
     
-    while True:
-        user_input = console.input("[bold green]You:[/] ")
-        
-        if user_input.lower() in ("exit", "quit", "q"):
-            console.print("[bold yellow]Exiting session[/]")
-            break
+    # One client for the whole session so turns reuse the same connection
+    async with httpx.AsyncClient(timeout=120.0, limits=HTTP_LIMITS) as client:
+        while True:
+            try:
+                user_input = console.input("[bold green]You:[/] ")
+            except EOFError:
+                # End of piped input (scripted use) or Ctrl-D ends the session
+                user_input = "exit"
+
+            if user_input.lower() in ("exit", "quit", "q"):
+                console.print("[bold yellow]Exiting session[/]")
+                break
             
-        # Check if user wants to start a new conversation
-        if user_input.lower() == "new":
-            conversation_id = None
-            save_conversation_id(None)
-            console.print("[bold yellow]Starting new conversation[/]")
-            continue
+            # Check if user wants to start a new conversation
+            if user_input.lower() == "new":
+                conversation_id = None
+                session_state["conversation_id"] = None
+                console.print("[bold yellow]Starting new conversation[/]")
+                continue
             
-        # Show processing indicator
-        with console.status("[bold blue]Processing...[/]"):
-            result = await process_input(api_url, user_input, conversation_id, debug)
+            # Show processing indicator
+            with console.status("[bold blue]Processing...[/]"):
+                result = await process_input(client, api_url, user_input, conversation_id, debug)
             
-        if not result:
-            continue
+            if not result:
+                continue
             
-        # Update conversation ID and save it
-        conversation_id = result.get("conversation_id")
-        save_conversation_id(conversation_id)
-        
-        # Display response
-        console.print("[bold blue]Agent:[/]", Markdown(result.get("response", "")))
-        
-        # Display tool usage info if available
-        tool_used = result.get("tool_used")
-        if tool_used:
-            console.print("[bold cyan]Tool used:[/]", tool_used)
-            console.print("[bold cyan]Parameters:[/]", json.dumps(result.get("tool_parameters", {}), indent=2))
+            # Update conversation ID; it is persisted when the session ends
+            conversation_id = result.get("conversation_id")
+            session_state["conversation_id"] = conversation_id
+
+            # Display response
+            response_text = result.get("response", "")
+            if plain:
+                # Skip Markdown parsing and highlighting entirely
+                sys.stdout.write(f"Agent: {response_text}\n")
+                sys.stdout.flush()
+            else:
+                # Parse the Markdown in a worker thread to keep the event loop free
+                markdown = await loop.run_in_executor(None, Markdown, response_text)
+                console.print("[bold blue]Agent:[/]", markdown)
+
+            # Display tool usage info if available
+            tool_used = result.get("tool_used")
+            if tool_used:
+                console.print("[bold cyan]Tool used:[/]", tool_used)
+                console.print("[bold cyan]Parameters:[/]", pretty_json(result.get("tool_parameters", {})))
             
-            tool_result = result.get("tool_result", {})
-            if tool_result.get("result"):
-                console.print("[bold cyan]Tool result:[/]", json.dumps(tool_result.get("result"), indent=2))
-            elif tool_result.get("error"):
-                console.print("[bold red]Tool error:[/]", tool_result.get("error"))
+                tool_result = result.get("tool_result", {})
+                if tool_result.get("result"):
+                    console.print("[bold cyan]Tool result:[/]", pretty_json(tool_result.get("result")))
+                elif tool_result.get("error"):
+                    console.print("[bold red]Tool error:[/]", tool_result.get("error"))
                 
-        console.print()
+            console.print()
 
 def main():
     parser = argparse.ArgumentParser(description="Apollo Tech Agent Client")
@@ -158,18 +189,37 @@ def main():
         action="store_true",
         help="Enable debug mode to see full API requests and responses"
     )
+    parser.add_argument(
+        "--plain",
+        action="store_true",
+        help="Plain text output without colors or Markdown rendering (for scripted use)"
+    )
     
     args = parser.parse_args()
     
+    if args.plain:
+        global console
+        console = Console(no_color=True, highlight=False)
+    
     # If --new flag was provided, delete any saved conversation
     if args.new and os.path.exists(CONVERSATION_STORE):
         os.remove(CONVERSATION_STORE)
         console.print("[bold yellow]Starting new conversation[/]")
     
+    # Use the libuv-based event loop when available
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+    
     try:
-        asyncio.run(interactive_session(args.api_url, args.debug))
+        asyncio.run(interactive_session(args.api_url, args.debug, args.plain))
     except KeyboardInterrupt:
         console.print("\n[bold yellow]Session terminated by user[/]")
+    finally:
+        # Persist the conversation once instead of after every turn
+        save_conversation_id(session_state["conversation_id"])
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
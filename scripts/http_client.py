@@ -0,0 +1,61 @@
+"""
+Shared HTTP Client
+
+The helper scripts talk to the same hosts several times in a row (model
+checks and pulls, tool lookups and registrations). They share one pooled
+client so connections are kept alive instead of being re-established for
+every request.
+"""
+
+import importlib.util
+import httpx
+from typing import AsyncIterator, Optional
+
+# Connection pool shared by every request a script makes
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=100)
+
+# HTTP/2 multiplexes concurrent requests over one connection, but httpx only
+# negotiates it over TLS and needs the optional h2 package (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_client: Optional[httpx.AsyncClient] = None
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Get the shared HTTP client, creating it on first use.
+
+    Returns:
+        The process-wide AsyncClient
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(timeout=30.0, limits=HTTP_LIMITS, http2=HTTP2_AVAILABLE)
+    return _client
+
+async def close_client() -> None:
+    """Close the shared HTTP client if it was created."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+async def aiter_byte_lines(response: httpx.Response) -> AsyncIterator[bytes]:
+    """
+    Yield the lines of a streamed response body as bytes.
+
+    NDJSON lines go straight to orjson, so they are never decoded to str.
+
+    Args:
+        response: Streaming response to read
+
+    Yields:
+        Each line without its trailing newline
+    """
+    pending = b""
+    async for data in response.aiter_bytes():
+        lines = (pending + data).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
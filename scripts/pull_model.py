@@ -9,9 +9,12 @@ import os
 import sys
 import argparse
 import httpx
+import orjson
 import asyncio
 import logging
-import json
+from typing import Optional
+
+from http_client import HTTP2_AVAILABLE, get_client, aiter_byte_lines
 
 # Configure logging
 logging.basicConfig(
@@ -24,13 +27,32 @@ logger = logging.getLogger(__name__)
 DEFAULT_OLLAMA_URL = "http://localhost:11434"
 DEFAULT_MODEL = "gemma3"
 
-async def pull_model(ollama_url: str, model_name: str) -> None:
+# Pulls stream progress for minutes, so only reads get the long timeout
+PULL_TIMEOUT = httpx.Timeout(connect=10.0, read=600.0, write=10.0, pool=10.0)
+
+# A pull needs one connection at a time; keeping it alive for a minute
+# lets back-to-back checks and pulls reuse it instead of reconnecting
+PULL_LIMITS = httpx.Limits(max_keepalive_connections=5, keepalive_expiry=60.0)
+
+def create_pull_client() -> httpx.AsyncClient:
+    """
+    Create an HTTP client tuned for talking to Ollama's model endpoints.
+    
+    Returns:
+        A new AsyncClient; the caller is responsible for closing it
+    """
+    return httpx.AsyncClient(timeout=PULL_TIMEOUT, limits=PULL_LIMITS, http2=HTTP2_AVAILABLE)
+
+async def pull_model(ollama_url: str, 
+                     model_name: str,
+                     client: Optional[httpx.AsyncClient] = None) -> None:
     """
     Pull a model from Ollama.
     
     Args:
         ollama_url: URL of the Ollama API
         model_name: Name of the model to pull
+        client: HTTP client to use (defaults to the shared client)
     """
     url = f"{ollama_url}/api/pull"
     
@@ -38,15 +60,37 @@ async def pull_model(ollama_url: str, model_name: str) -> None:
     
     payload = {
         "name": model_name,
-        "stream": False
+        "stream": True
     }
     
+    client = client or get_client()
+    
     try:
-        async with httpx.AsyncClient(timeout=600.0) as client:
-            response = await client.post(url, json=payload)
+        # Progress is streamed as NDJSON events, so nothing is buffered and
+        # failures surface as soon as Ollama reports them
+        async with client.stream("POST", url, json=payload, timeout=PULL_TIMEOUT) as response:
+            if response.is_error:
+                # Load the body so the error handler can log it
+                await response.aread()
             response.raise_for_status()
             
-            logger.info(f"Successfully pulled model '{model_name}'")
+            status = None
+            async for line in aiter_byte_lines(response):
+                if not line.strip():
+                    continue
+                event = orjson.loads(line)
+                
+                if "error" in event:
+                    logger.error(f"Ollama failed to pull model '{model_name}': {event['error']}")
+                    sys.exit(1)
+                    
+                # Download events repeat the same status with new byte counts;
+                # only log when the stage changes
+                if event.get("status") != status:
+                    status = event.get("status")
+                    logger.info(f"Pull status: {status}")
+        
+        logger.info(f"Successfully pulled model '{model_name}'")
             
     except httpx.HTTPStatusError as e:
         logger.error(f"HTTP error pulling model: {e.response.status_code} - {e.response.text}")
@@ -55,26 +99,33 @@ async def pull_model(ollama_url: str, model_name: str) -> None:
         logger.error(f"Error pulling model: {str(e)}")
         sys.exit(1)
 
-async def check_model_exists(ollama_url: str, model_name: str) -> bool:
+async def check_model_exists(ollama_url: str, 
+                             model_name: str,
+                             client: Optional[httpx.AsyncClient] = None) -> bool:
     """
     Check if a model already exists in Ollama.
     
+    Asks Ollama about this one model instead of listing every installed
+    model; Ollama also resolves the default tag, so "gemma3" matches a
+    local "gemma3:latest".
+    
     Args:
         ollama_url: URL of the Ollama API
         model_name: Name of the model to check
+        client: HTTP client to use (defaults to the shared client)
         
     Returns:
         True if the model exists, False otherwise
     """
-    url = f"{ollama_url}/api/tags"
+    url = f"{ollama_url}/api/show"
+    client = client or get_client()
     
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(url)
-            response.raise_for_status()
-            
-            models = response.json().get("models", [])
-            return any(model.get("name") == model_name for model in models)
+        response = await client.post(url, json={"name": model_name})
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
             
     except Exception as e:
         logger.error(f"Error checking if model exists: {str(e)}")
@@ -102,6 +153,13 @@ def main():
     
     args = parser.parse_args()
     
+    # Use the libuv-based event loop when available
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+    
     try:
         asyncio.run(async_main(args))
     except KeyboardInterrupt:
@@ -111,13 +169,18 @@ def main():
         sys.exit(1)
 
 async def async_main(args):
-    # Check if model already exists
-    if not args.force and await check_model_exists(args.ollama_url, args.model_name):
-        logger.info(f"Model '{args.model_name}' already exists. Use --force to pull again.")
-        return
-        
-    # Pull the model
-    await pull_model(args.ollama_url, args.model_name)
+    # The existence check and the pull reuse the same connection
+    client = create_pull_client()
+    try:
+        # Check if model already exists
+        if not args.force and await check_model_exists(args.ollama_url, args.model_name, client):
+            logger.info(f"Model '{args.model_name}' already exists. Use --force to pull again.")
+            return
+            
+        # Pull the model
+        await pull_model(args.ollama_url, args.model_name, client)
+    finally:
+        await client.aclose()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
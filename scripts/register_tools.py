@@ -11,9 +11,12 @@ import sys
 import json
 import argparse
 import httpx
+import orjson
 import asyncio
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+
+from http_client import HTTP_LIMITS, get_client, close_client
 
 # Configure logging
 logging.basicConfig(
@@ -25,6 +28,13 @@ logger = logging.getLogger(__name__)
 # Default Tool Manager URL
 DEFAULT_TOOL_MANAGER_URL = "http://localhost:8000"
 
+# Request bodies are serialized up front and sent as raw bytes
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+# Registrations in flight at once; matches the keep-alive pool so requests
+# reuse pooled connections instead of queueing for new ones
+MAX_CONCURRENT_REGISTRATIONS = HTTP_LIMITS.max_keepalive_connections
+
 # Tool definitions
 TOOLS = [
     {
@@ -68,44 +78,177 @@ TOOLS = [
     }
 ]
 
-async def register_tools(tool_manager_url: str, tools: List[Dict[str, Any]]) -> None:
+async def register_batch(client: httpx.AsyncClient, 
+                         url: str, 
+                         tools: List[Dict[str, Any]],
+                         bodies: List[bytes]) -> bool:
+    """
+    Register all tools in a single request to the Tool Manager's bulk endpoint.
+    
+    Args:
+        client: HTTP client to use
+        url: URL of the Tool Manager's tools collection
+        tools: Tool definitions to register
+        bodies: The tools serialized as JSON, in the same order
+        
+    Returns:
+        True if the batch was accepted, False if the Tool Manager has no bulk
+        endpoint or rejected the batch and the tools must be registered one by one
+    """
+    # Splice the already serialized tools into the batch body
+    batch_body = b'{"tools":[' + b",".join(bodies) + b"]}"
+    try:
+        response = await client.post(f"{url}:batch", content=batch_body, headers=JSON_HEADERS)
+    except httpx.RequestError as e:
+        logger.warning(f"Batch registration failed, registering tools individually: {str(e)}")
+        return False
+    if response.is_error:
+        logger.info(f"Batch registration returned {response.status_code}, registering tools individually")
+        return False
+    
+    try:
+        results = orjson.loads(response.content)
+    except orjson.JSONDecodeError:
+        logger.info("Batch registration returned no JSON, registering tools individually")
+        return False
+    # Anything but a list of per-tool results means nothing can be assumed
+    # to be registered
+    if not isinstance(results, list) or not all(isinstance(result, dict) for result in results):
+        logger.info("Batch registration returned an unexpected body, registering tools individually")
+        return False
+    for result in results:
+        logger.info(f"Registered tool {result.get('name')} (ID: {result.get('id')}): {result.get('status')}")
+    return True
+
+async def fetch_existing_tools(client: httpx.AsyncClient, url: str) -> Optional[Dict[str, Any]]:
+    """
+    List the tools already registered, keyed by name.
+    
+    Args:
+        client: HTTP client to use
+        url: URL of the Tool Manager's tools collection
+        
+    Returns:
+        Mapping of tool name to registered tool, or None if the listing failed
+    """
+    try:
+        response = await client.get(url)
+        response.raise_for_status()
+        return {tool["name"]: tool for tool in orjson.loads(response.content)}
+    except Exception as e:
+        logger.warning(f"Could not list existing tools, looking them up one by one: {str(e)}")
+        return None
+
+def is_unchanged(existing_tool: Dict[str, Any], tool: Dict[str, Any]) -> bool:
+    """
+    Check whether a registered tool already matches its definition.
+    
+    Only the fields of the definition are compared, so server-side
+    fields such as the ID don't count as a difference.
+    
+    Args:
+        existing_tool: Tool as returned by the Tool Manager
+        tool: Tool definition to register
+        
+    Returns:
+        True if updating the tool would not change it
+    """
+    current = {key: existing_tool.get(key) for key in tool}
+    return orjson.dumps(current, option=orjson.OPT_SORT_KEYS) == orjson.dumps(tool, option=orjson.OPT_SORT_KEYS)
+
+async def register_one(client: httpx.AsyncClient, 
+                       url: str, 
+                       tool: Dict[str, Any],
+                       body: bytes,
+                       existing: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Create or update a single tool in the Tool Manager.
+    
+    Args:
+        client: HTTP client to use
+        url: URL of the Tool Manager's tools collection
+        tool: Tool definition to register
+        body: The tool serialized as JSON
+        existing: Registered tools by name from the listing; tools missing
+            from it (or all tools, if None) are looked up by name first, which
+            costs an extra round trip
+    """
+    logger.info(f"Registering tool: {tool['name']}")
+    
+    try:
+        existing_tool = existing.get(tool["name"]) if existing is not None else None
+        if existing_tool is None:
+            # Check if tool already exists by name; a paginated listing may
+            # not have included it even though it is registered
+            response = await client.get(f"{url}?name={tool['name']}")
+            matches = orjson.loads(response.content) if response.status_code == 200 else []
+            existing_tool = matches[0] if matches else None
+        
+        if existing_tool is not None:
+            tool_id = existing_tool["id"]
+            if is_unchanged(existing_tool, tool):
+                logger.info(f"Tool {tool['name']} (ID: {tool_id}) is unchanged, skipping update")
+                return
+            
+            # Tool exists, update it
+            logger.info(f"Tool {tool['name']} already exists (ID: {tool_id}). Updating.")
+            
+            response = await client.put(f"{url}/{tool_id}", content=body, headers=JSON_HEADERS)
+            response.raise_for_status()
+            logger.info(f"Updated tool {tool['name']} (ID: {tool_id})")
+        else:
+            # Tool doesn't exist, create it
+            response = await client.post(url, content=body, headers=JSON_HEADERS)
+            response.raise_for_status()
+            created_tool = orjson.loads(response.content)
+            logger.info(f"Created tool {tool['name']} (ID: {created_tool.get('id')})")
+            
+    except httpx.HTTPStatusError as e:
+        logger.error(f"HTTP error registering tool {tool['name']}: {e.response.status_code} - {e.response.text}")
+    except Exception as e:
+        logger.error(f"Error registering tool {tool['name']}: {str(e)}")
+
+async def register_tools(tool_manager_url: str, 
+                         tools: List[Dict[str, Any]],
+                         client: Optional[httpx.AsyncClient] = None) -> None:
     """
     Register tools with the Tool Manager API.
     
+    All tools are sent in one bulk request when the Tool Manager supports it.
+    Otherwise the registered tools are listed once up front, so each tool
+    found there needs a single update request (or none, if unchanged);
+    tools missing from the listing are looked up by name before creating
+    them, in case the listing was paginated. Tools are independent of
+    each other, so they are registered concurrently, at most
+    MAX_CONCURRENT_REGISTRATIONS at a time.
+    
     Args:
         tool_manager_url: URL of the Tool Manager API
         tools: List of tool definitions to register
+        client: HTTP client to use (defaults to the shared client)
     """
     url = f"{tool_manager_url}/tools"
+    client = client or get_client()
+    # Serialize each tool once; the same bytes serve the batch and single requests
+    bodies = [orjson.dumps(tool) for tool in tools]
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        for tool in tools:
-            logger.info(f"Registering tool: {tool['name']}")
-            
-            try:
-                # Check if tool already exists by name
-                response = await client.get(f"{url}?name={tool['name']}")
-                
-                if response.status_code == 200 and response.json():
-                    # Tool exists, update it
-                    existing_tool = response.json()[0]
-                    tool_id = existing_tool["id"]
-                    logger.info(f"Tool {tool['name']} already exists (ID: {tool_id}). Updating.")
-                    
-                    response = await client.put(f"{url}/{tool_id}", json=tool)
-                    response.raise_for_status()
-                    logger.info(f"Updated tool {tool['name']} (ID: {tool_id})")
-                else:
-                    # Tool doesn't exist, create it
-                    response = await client.post(url, json=tool)
-                    response.raise_for_status()
-                    created_tool = response.json()
-                    logger.info(f"Created tool {tool['name']} (ID: {created_tool.get('id')})")
-                    
-            except httpx.HTTPStatusError as e:
-                logger.error(f"HTTP error registering tool {tool['name']}: {e.response.status_code} - {e.response.text}")
-            except Exception as e:
-                logger.error(f"Error registering tool {tool['name']}: {str(e)}")
+    if await register_batch(client, url, tools, bodies):
+        return
+    
+    existing = await fetch_existing_tools(client, url)
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REGISTRATIONS)
+    
+    async def bounded(tool: Dict[str, Any], body: bytes) -> None:
+        async with semaphore:
+            await register_one(client, url, tool, body, existing)
+    
+    results = await asyncio.gather(
+        *(bounded(tool, body) for tool, body in zip(tools, bodies)),
+        return_exceptions=True
+    )
+    for tool, result in zip(tools, results):
+        if isinstance(result, BaseException):
+            logger.error(f"Error registering tool {tool['name']}: {str(result)}")
 
 def main():
     parser = argparse.ArgumentParser(description="Register tools with the Tool Manager API")
@@ -118,9 +261,16 @@ def main():
     
     args = parser.parse_args()
     
+    # Use the libuv-based event loop when available
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+    
     try:
         logger.info(f"Registering tools with Tool Manager API at {args.tool_manager_url}")
-        asyncio.run(register_tools(args.tool_manager_url, TOOLS))
+        asyncio.run(async_main(args))
         logger.info("Tool registration complete")
     except KeyboardInterrupt:
         logger.info("Tool registration interrupted")
@@ -128,5 +278,11 @@ def main():
         logger.error(f"Error during tool registration: {str(e)}")
         sys.exit(1)
 
+async def async_main(args):
+    try:
+        await register_tools(args.tool_manager_url, TOOLS)
+    finally:
+        await close_client()
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -1,29 +1,48 @@
 import pytest
 import json
-from unittest.mock import AsyncMock, patch, MagicMock
+from unittest.mock import AsyncMock, patch
 import httpx
 
 from app.agent import Agent
 from app.services.context_manager import ContextManager
 
-@pytest.fixture
-def mock_http_response():
-    """Create a mock HTTP response."""
-    mock_response = MagicMock()
-    # Make raise_for_status return a regular value instead of a coroutine
-    mock_response.raise_for_status = MagicMock()
-    mock_response.json = MagicMock()
-    return mock_response
+class FakeToolManager:
+    """Serves canned Tool Manager responses through httpx.MockTransport."""
+    
+    def __init__(self):
+        self.client = httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+        self.reset()
+    
+    def reset(self):
+        """Forget recorded requests and canned responses."""
+        self.requests = []
+        self.tools = []
+        self.results = []
+        self.lookup_status = 200
+    
+    def handle(self, request):
+        """Answer /tool_lookup with the tools and /tool_usage with the next result."""
+        self.requests.append(request)
+        if request.url.path == "/tool_lookup":
+            return httpx.Response(self.lookup_status, json={"tools": self.tools})
+        if request.url.path == "/tool_usage":
+            return httpx.Response(200, json=self.results.pop(0))
+        return httpx.Response(404)
+    
+    def paths(self):
+        """Paths of the requests received so far, in order."""
+        return [request.url.path for request in self.requests]
+
+@pytest.fixture(scope="session")
+def shared_tool_manager():
+    """Create one fake Tool Manager and HTTPX client for the whole test session."""
+    return FakeToolManager()
 
 @pytest.fixture
-def mock_httpx_client():
-    """Create a mock HTTPX client."""
-    with patch("httpx.AsyncClient") as mock_client:
-        client_instance = AsyncMock()
-        mock_client.return_value = client_instance
-        client_instance.post = AsyncMock()
-        client_instance.aclose = AsyncMock()
-        yield client_instance
+def tool_manager(shared_tool_manager):
+    """Provide the shared fake Tool Manager with a clean state for each test."""
+    shared_tool_manager.reset()
+    return shared_tool_manager
 
 @pytest.fixture
 def mock_llm_connector():
@@ -35,8 +54,13 @@ def mock_llm_connector():
         connector_instance.close = AsyncMock()
         yield connector_instance
 
+@pytest.fixture(scope="module")
+def context_manager():
+    """Create one context manager shared by the tests in this module."""
+    return ContextManager()
+
 @pytest.mark.asyncio
-async def test_fetch_relevant_tools(mock_httpx_client, mock_http_response):
+async def test_fetch_relevant_tools(tool_manager):
     """Test fetching relevant tools."""
     # Setup
     tools_data = {
@@ -56,21 +80,20 @@ async def test_fetch_relevant_tools(mock_httpx_client, mock_http_response):
         ]
     }
     
-    mock_http_response.json.return_value = tools_data
-    mock_httpx_client.post.return_value = mock_http_response
+    tool_manager.tools = tools_data["tools"]
     
-    agent = Agent(tool_manager_url="http://mock-url")
-    agent.http_client = mock_httpx_client
+    agent = Agent(tool_manager_url="http://mock-url", http_client=tool_manager.client)
     
     # Execute
     result = await agent._fetch_relevant_tools("Format this text")
     
     # Assert
-    mock_httpx_client.post.assert_called_once()
+    assert tool_manager.paths() == ["/tool_lookup"]
+    assert json.loads(tool_manager.requests[0].content) == {"prompt": "Format this text", "top_k": 3}
     assert result == tools_data["tools"]
 
 @pytest.mark.asyncio
-async def test_execute_tool(mock_httpx_client, mock_http_response):
+async def test_execute_tool(tool_manager):
     """Test executing a tool."""
     # Setup
     tool_result = {
@@ -78,11 +101,9 @@ async def test_execute_tool(mock_httpx_client, mock_http_response):
         "error": None
     }
     
-    mock_http_response.json.return_value = tool_result
-    mock_httpx_client.post.return_value = mock_http_response
+    tool_manager.results = [tool_result]
     
-    agent = Agent(tool_manager_url="http://mock-url")
-    agent.http_client = mock_httpx_client
+    agent = Agent(tool_manager_url="http://mock-url", http_client=tool_manager.client)
     
     tool_call = {
         "name": "format_text",
@@ -96,7 +117,8 @@ async def test_execute_tool(mock_httpx_client, mock_http_response):
     result = await agent._execute_tool(tool_call)
     
     # Assert
-    mock_httpx_client.post.assert_called_once()
+    assert tool_manager.paths() == ["/tool_usage"]
+    assert json.loads(tool_manager.requests[0].content) == {"tool_call": tool_call}
     assert result == tool_result
 
 @pytest.mark.asyncio
@@ -121,6 +143,24 @@ async def test_parse_llm_response_with_tool_call():
     assert result["tool_call"]["parameters"]["text"] == "hello world"
     assert result["tool_call"]["parameters"]["format_type"] == "upper"
 
+@pytest.mark.asyncio
+async def test_parse_llm_response_with_braces_in_strings():
+    """Test that braces inside JSON strings don't break tool call extraction."""
+    # Setup
+    agent = Agent(tool_manager_url="http://mock-url")
+    
+    response = {
+        "response": "Sure! {\"tool_call\": {\"name\": \"format_text\", \"parameters\": {\"text\": \"a } b {\", \"format_type\": \"upper\"}}}"
+    }
+    
+    # Execute
+    result = await agent._parse_llm_response(response)
+    
+    # Assert
+    assert result["tool_call"]["name"] == "format_text"
+    assert result["tool_call"]["parameters"]["text"] == "a } b {"
+    assert result["text"] == "Sure!"
+
 @pytest.mark.asyncio
 async def test_parse_llm_response_without_tool_call():
     """Test parsing LLM response without a tool call."""
@@ -138,9 +178,10 @@ async def test_parse_llm_response_without_tool_call():
     # Assert
     assert result["text"] == "The answer to your question is 42."
     assert result["tool_call"] is None
+    assert result["structured"] is False
 
 @pytest.mark.asyncio
-async def test_process_input(mock_llm_connector, mock_httpx_client, mock_http_response):
+async def test_process_input(mock_llm_connector, tool_manager, context_manager):
     """Test processing user input."""
     # Setup
     tools_data = {
@@ -165,12 +206,9 @@ async def test_process_input(mock_llm_connector, mock_httpx_client, mock_http_re
         "error": None
     }
     
-    # Mock responses
-    mock_http_response.json.side_effect = [
-        tools_data,  # For _fetch_relevant_tools
-        tool_result  # For _execute_tool
-    ]
-    mock_httpx_client.post.return_value = mock_http_response
+    # Tool Manager responses
+    tool_manager.tools = tools_data["tools"]
+    tool_manager.results = [tool_result]
     
     # Mock LLM responses - Use valid JSON in the first response
     mock_llm_connector.generate_with_tool_context.side_effect = [
@@ -179,12 +217,12 @@ async def test_process_input(mock_llm_connector, mock_httpx_client, mock_http_re
     ]
     
     # Create agent with mocks
-    agent = Agent(tool_manager_url="http://mock-url")
-    agent.http_client = mock_httpx_client
+    agent = Agent(tool_manager_url="http://mock-url", http_client=tool_manager.client)
     agent.llm_connector = mock_llm_connector
     
-    # Use context manager for testing to avoid dealing with creating mocks for its methods
-    agent.context_manager = ContextManager()
+    # Use a real context manager to avoid dealing with creating mocks for its methods;
+    # conversations are keyed by fresh IDs, so sharing it across tests is safe
+    agent.context_manager = context_manager
     
     # Execute
     result = await agent.process_input("Format 'hello world' to uppercase")
@@ -195,4 +233,266 @@ async def test_process_input(mock_llm_connector, mock_httpx_client, mock_http_re
     assert result["tool_used"] == "format_text"
     assert result["tool_parameters"]["text"] == "hello world"
     assert result["tool_parameters"]["format_type"] == "upper"
-    assert result["tool_result"] == tool_result 
\ No newline at end of file
+    assert result["tool_result"] == tool_result
+    
+    # The user message is recorded once even though a follow-up call was made
+    messages = agent.context_manager.conversations[result["conversation_id"]].messages
+    assert [m.role for m in messages] == ["user", "assistant"]
+    assert tool_manager.paths() == ["/tool_lookup", "/tool_usage"]
+
+@pytest.mark.asyncio
+async def test_process_input_uses_semantic_cache(mock_llm_connector, tool_manager):
+    """Test that a prompt differing only in surrounding whitespace is served from the cache."""
+    # Setup
+    mock_llm_connector.generate_with_tool_context.return_value = {
+        "response": "{\"response\": \"Paris is the capital of France.\", \"tool_call\": null}"
+    }
+    
+    agent = Agent(tool_manager_url="http://mock-url", http_client=tool_manager.client)
+    agent.llm_connector = mock_llm_connector
+    
+    # Execute
+    first = await agent.process_input("What is the capital of France?")
+    second = await agent.process_input("  What is the capital of France?\n")
+    
+    # Assert
+    assert mock_llm_connector.generate_with_tool_context.call_count == 1
+    assert second["response"] == first["response"] == "Paris is the capital of France."
+    assert second["conversation_id"] != first["conversation_id"]
+    assert agent.context_manager.has_history(second["conversation_id"])
+
+@pytest.mark.asyncio
+async def test_process_input_does_not_cache_degraded_responses(mock_llm_connector, tool_manager):
+    """Test that error replies and replies generated without a tool lookup are not cached."""
+    # Setup
+    answer = {"response": "{\"response\": \"Paris is the capital of France.\", \"tool_call\": null}"}
+    mock_llm_connector.generate_with_tool_context.side_effect = [
+        {"response": "I'm sorry, I encountered an error processing your request.", "error": "model is loading"},
+        answer,
+        answer,
+        answer
+    ]
+    
+    agent = Agent(tool_manager_url="http://mock-url", http_client=tool_manager.client)
+    agent.llm_connector = mock_llm_connector
+    
+    # Execute
+    errored = await agent.process_input("What is the capital of France?")
+    recovered = await agent.process_input("What is the capital of France?")
+    
+    tool_manager.lookup_status = 503
+    without_tools = await agent.process_input("Where is the Louvre?")
+    tool_manager.lookup_status = 200
+    retried = await agent.process_input("Where is the Louvre?")
+    
+    # Assert
+    assert "sorry" in errored["response"]
+    assert recovered["response"] == "Paris is the capital of France."
+    assert without_tools["response"] == retried["response"]
+    assert mock_llm_connector.generate_with_tool_context.call_count == 4
+
+@pytest.mark.asyncio
+async def test_process_input_executes_multiple_tool_calls(mock_llm_connector, tool_manager):
+    """Test that a list of tool calls is executed and reported in order."""
+    # Setup
+    upper_result = {"result": {"formatted_text": "HELLO"}, "error": None}
+    count_result = {"result": {"total_words": 2}, "error": None}
+    
+    tool_manager.results = [upper_result, count_result]
+    
+    mock_llm_connector.generate_with_tool_context.side_effect = [
+        {"response": json.dumps({
+            "response": "On it.",
+            "tool_call": [
+                {"name": "format_text", "parameters": {"text": "hello", "format_type": "upper"}},
+                {"name": "count_words", "parameters": {"text": "hello world"}}
+            ]
+        })},
+        {"response": "HELLO, and there are 2 words."}
+    ]
+    
+    agent = Agent(tool_manager_url="http://mock-url", http_client=tool_manager.client)
+    agent.llm_connector = mock_llm_connector
+    
+    # Execute
+    result = await agent.process_input("Uppercase 'hello' and count the words in 'hello world'")
+    
+    # Assert
+    assert tool_manager.paths() == ["/tool_lookup", "/tool_usage", "/tool_usage"]
+    assert result["response"] == "HELLO, and there are 2 words."
+    assert result["tool_used"] == "format_text"
+    assert result["tool_result"] == upper_result
+    assert [call["name"] for call in result["tool_calls"]] == ["format_text", "count_words"]
+    assert result["tool_calls"][1]["result"] == count_result
+    
+    tool_calls = agent.context_manager.conversations[result["conversation_id"]].tool_calls
+    assert [call.tool_name for call in tool_calls] == ["format_text", "count_words"]
+
+@pytest.mark.asyncio
+async def test_parse_llm_response_with_trailing_text():
+    """Test parsing a JSON reply that is followed by extra prose."""
+    # Setup
+    agent = Agent(tool_manager_url="http://mock-url")
+    
+    response = {
+        "response": "  {\"response\": \"Done.\", \"tool_call\": null}\nLet me know if you need anything else!"
+    }
+    
+    # Execute
+    result = await agent._parse_llm_response(response)
+    
+    # Assert
+    assert result["text"] == "Done."
+    assert result["tool_call"] is None
+    assert result["structured"] is True
+
+@pytest.mark.asyncio
+async def test_close_leaves_shared_http_client_open(tool_manager):
+    """Test that the agent doesn't close an HTTP client it was given."""
+    # Setup
+    agent = Agent(tool_manager_url="http://mock-url", http_client=tool_manager.client)
+    
+    # Execute
+    await agent.close()
+    
+    # Assert
+    assert not tool_manager.client.is_closed
+
+@pytest.mark.asyncio
+async def test_parse_llm_response_with_single_quoted_tool_call():
+    """Test parsing a Python-style tool call followed by other braces."""
+    # Setup
+    agent = Agent(tool_manager_url="http://mock-url")
+    
+    response = {
+        "response": "Let me do that. {'tool_call': {'name': 'count_words', 'parameters': {'text': 'hi there'}}} (see {docs})"
+    }
+    
+    # Execute
+    result = await agent._parse_llm_response(response)
+    
+    # Assert
+    assert result["tool_call"] == {"name": "count_words", "parameters": {"text": "hi there"}}
+    assert result["text"] == "Let me do that.  (see {docs})"
+
+@pytest.mark.asyncio
+async def test_process_input_rejects_invalid_tool_parameters(mock_llm_connector, tool_manager):
+    """Test that a tool call missing required parameters is not sent to the Tool Manager."""
+    # Setup
+    tool_manager.tools = [
+        {
+            "name": "format_text",
+            "description": "Format text according to specified style",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "text": {"type": "string"},
+                    "format_type": {"type": "string", "enum": ["upper", "lower"]}
+                },
+                "required": ["text", "format_type"]
+            }
+        }
+    ]
+    
+    mock_llm_connector.generate_with_tool_context.return_value = {
+        "response": "{\"response\": \"On it.\", \"tool_call\": {\"name\": \"format_text\", \"parameters\": {\"text\": \"hi\"}}}"
+    }
+    
+    agent = Agent(tool_manager_url="http://mock-url", http_client=tool_manager.client)
+    agent.llm_connector = mock_llm_connector
+    
+    # Execute
+    result = await agent.process_input("Format 'hi'")
+    
+    # Assert
+    assert tool_manager.paths() == ["/tool_lookup"]  # The tool is never called
+    assert result["tool_result"]["result"] is None
+    assert "format_type" in result["tool_result"]["error"]
+    assert mock_llm_connector.generate_with_tool_context.call_count == 1
+
+@pytest.mark.asyncio
+async def test_process_input_accepts_union_typed_parameters(mock_llm_connector, tool_manager):
+    """Test that a property with a list of types is validated instead of crashing."""
+    # Setup
+    tool_manager.tools = [
+        {
+            "name": "count_words",
+            "description": "Count the words in a text",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "text": {"type": "string"},
+                    "language": {"type": ["string", "null"]}
+                },
+                "required": ["text"]
+            }
+        }
+    ]
+    tool_manager.results = [{"result": {"total_words": 2}, "error": None}]
+    
+    mock_llm_connector.generate_with_tool_context.side_effect = [
+        {"response": "{\"response\": \"On it.\", \"tool_call\": [{\"name\": \"count_words\", \"parameters\": {\"text\": \"hi there\", \"language\": null}}, {\"name\": \"count_words\", \"parameters\": {\"text\": \"hi\", \"language\": 5}}]}"},
+        {"response": "There are 2 words."}
+    ]
+    
+    agent = Agent(tool_manager_url="http://mock-url", http_client=tool_manager.client)
+    agent.llm_connector = mock_llm_connector
+    
+    # Execute
+    result = await agent.process_input("Count the words in 'hi there'")
+    
+    # Assert
+    assert tool_manager.paths() == ["/tool_lookup", "/tool_usage"]
+    assert result["tool_calls"][0]["result"] == {"result": {"total_words": 2}, "error": None}
+    assert "language" in result["tool_calls"][1]["result"]["error"]
+
+@pytest.mark.asyncio
+async def test_negative_cache_only_skips_lookup_after_failures(mock_llm_connector, tool_manager):
+    """Test that only failed turns skip the tool lookup, and only in their own conversation."""
+    # Setup
+    mock_llm_connector.generate_with_tool_context.return_value = {
+        "response": "{\"response\": \"Which file do you mean?\", \"tool_call\": null}"
+    }
+    tool_manager.tools = [{"name": "count_words", "description": "Count the words in a text"}]
+    
+    agent = Agent(tool_manager_url="http://mock-url", http_client=tool_manager.client)
+    agent.llm_connector = mock_llm_connector
+    
+    # Execute (debug mode bypasses the response caches): a well-formed
+    # reply without a tool call is not a failure
+    first = await agent.process_input("yes, do it", conversation_id="a", debug_mode=True)
+    await agent.process_input("yes, do it", conversation_id="b", debug_mode=True)
+    
+    # A failed lookup makes retries in the same conversation skip it
+    tool_manager.lookup_status = 503
+    await agent.process_input("count the words", conversation_id="a", debug_mode=True)
+    tool_manager.lookup_status = 200
+    await agent.process_input("count the words", conversation_id="a", debug_mode=True)
+    await agent.process_input("count the words", conversation_id="b", debug_mode=True)
+    
+    # Assert
+    offered = [
+        [tool["name"] for tool in call.kwargs["tools"]]
+        for call in mock_llm_connector.generate_with_tool_context.call_args_list
+    ]
+    assert first["response"] == "Which file do you mean?"
+    assert offered == [["count_words"], ["count_words"], [], [], ["count_words"]]
+    assert tool_manager.paths().count("/tool_lookup") == 3  # The retry in "a" skipped it
+
+@pytest.mark.asyncio
+async def test_parse_llm_response_keeps_prose_around_example_code_block():
+    """Test that a fenced JSON example that isn't the reply format is kept as text."""
+    # Setup
+    agent = Agent(tool_manager_url="http://mock-url")
+    
+    response = {
+        "response": "Here is an example:\n```json\n{\"name\": \"x\"}\n```\nHope it helps"
+    }
+    
+    # Execute
+    result = await agent._parse_llm_response(response)
+    
+    # Assert
+    assert result["text"] == response["response"]
+    assert result["tool_call"] is None
+    assert result["structured"] is False
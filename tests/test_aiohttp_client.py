@@ -0,0 +1,78 @@
+import pytest
+import pytest_asyncio
+import httpx
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.services.aiohttp_client import AiohttpClient
+
+@pytest_asyncio.fixture
+async def server():
+    """Serve a small JSON API over a real aiohttp test server."""
+    async def echo(request):
+        response = web.json_response({"received": await request.json()})
+        # Sent gzipped, so the client has to drop the encoding header
+        response.enable_compression(web.ContentCoding.gzip)
+        return response
+    
+    async def missing(request):
+        return web.json_response({"detail": "not found"}, status=404)
+    
+    app = web.Application()
+    app.router.add_post("/echo", echo)
+    app.router.add_post("/missing", missing)
+    
+    test_server = TestServer(app)
+    await test_server.start_server()
+    yield test_server
+    await test_server.close()
+
+@pytest.mark.asyncio
+async def test_post_returns_httpx_response(server):
+    """Test that a successful response is converted to an httpx.Response."""
+    # Setup
+    client = AiohttpClient()
+    
+    # Execute
+    response = await client.post(str(server.make_url("/echo")), json={"prompt": "hi"})
+    await client.aclose()
+    
+    # Assert
+    assert isinstance(response, httpx.Response)
+    assert response.status_code == 200
+    response.raise_for_status()
+    assert response.json() == {"received": {"prompt": "hi"}}
+    # aiohttp already decompressed the body; httpx must not try again
+    assert "content-encoding" not in response.headers
+
+@pytest.mark.asyncio
+async def test_post_error_raises_http_status_error(server):
+    """Test that raise_for_status raises httpx.HTTPStatusError for error responses."""
+    # Setup
+    client = AiohttpClient()
+    
+    # Execute
+    response = await client.post(str(server.make_url("/missing")), json={})
+    await client.aclose()
+    
+    # Assert
+    with pytest.raises(httpx.HTTPStatusError):
+        response.raise_for_status()
+    assert response.json() == {"detail": "not found"}
+
+@pytest.mark.asyncio
+async def test_client_is_usable_again_after_close(server):
+    """Test that a closed client opens a new session on its next request."""
+    # Setup
+    client = AiohttpClient()
+    await client.post(str(server.make_url("/echo")), json={})
+    await client.aclose()
+    
+    # Execute
+    response = await client.post(str(server.make_url("/echo")), json={"again": True})
+    await client.aclose()
+    
+    # Assert
+    assert response.json() == {"received": {"again": True}}
@@ -0,0 +1,76 @@
+from app.services.context_manager import ContextManager, estimate_tokens
+
+def test_add_message_keeps_token_count_when_history_evicts():
+    """Test that token_count drops the tokens of messages evicted by the length limit."""
+    # Setup
+    manager = ContextManager(max_history_length=3, max_tokens=100_000)
+    
+    # Execute
+    for i in range(5):
+        manager.add_message("conv", "user", f"message number {i} " * (i + 1))
+    
+    # Assert
+    conversation = manager.conversations["conv"]
+    assert [m.content.split()[2] for m in conversation.messages] == ["2", "3", "4"]
+    assert conversation.token_count == sum(m.tokens for m in conversation.messages)
+
+def test_add_message_trims_oldest_messages_to_token_budget():
+    """Test that the oldest messages are dropped once the token budget is exceeded."""
+    # Setup
+    manager = ContextManager(max_history_length=50)
+    manager.max_tokens = manager._system_tokens + 3 * estimate_tokens("User: " + "x" * 40 + "\n\n")
+    
+    # Execute
+    for i in range(6):
+        manager.add_message("conv", "user", str(i) * 40)
+    
+    # Assert
+    conversation = manager.conversations["conv"]
+    assert [m.content[0] for m in conversation.messages] == ["3", "4", "5"]
+    assert conversation.token_count == sum(m.tokens for m in conversation.messages)
+    assert conversation.token_count + manager._system_tokens <= manager.max_tokens
+
+def test_add_message_always_keeps_newest_message():
+    """Test that a single message over the budget is still kept."""
+    # Setup
+    manager = ContextManager(max_tokens=10)
+    
+    # Execute
+    manager.add_message("conv", "user", "short")
+    manager.add_message("conv", "assistant", "y" * 1000)
+    
+    # Assert
+    messages = manager.conversations["conv"].messages
+    assert [m.role for m in messages] == ["assistant"]
+    assert manager.conversations["conv"].token_count == messages[0].tokens
+
+def test_get_tool_context_drops_oldest_calls_over_max_chars():
+    """Test that the character budget keeps the most recent tool calls."""
+    # Setup
+    manager = ContextManager()
+    for i in range(4):
+        manager.add_tool_call("conv", "count_words", {"text": str(i) * 30}, result={"total_words": 1})
+    line_length = len('- count_words({"text":"' + "0" * 30 + '"}) -> {"total_words":1}') + 1
+    
+    # Execute
+    context = manager.get_tool_context("conv", max_chars=2 * line_length)
+    
+    # Assert
+    lines = context.splitlines()
+    assert lines[0] == "Recent tool calls:"
+    assert lines[1:] == [
+        f'- count_words({{"text":"{str(i) * 30}"}}) -> {{"total_words":1}}'
+        for i in (2, 3)
+    ]
+
+def test_get_tool_context_keeps_newest_call_over_max_chars():
+    """Test that the newest call is rendered even if it alone exceeds the budget."""
+    # Setup
+    manager = ContextManager()
+    manager.add_tool_call("conv", "format_text", {"text": "x" * 100}, error="boom")
+    
+    # Execute
+    context = manager.get_tool_context("conv", max_chars=10)
+    
+    # Assert
+    assert context.splitlines()[1].endswith("-> error: boom")
@@ -0,0 +1,247 @@
+import asyncio
+import pytest
+import json
+import httpx
+
+from app.services.llm_connector import OllamaConnector
+
+def ndjson(*chunks):
+    """Encode chunks the way Ollama streams them."""
+    return "".join(json.dumps(chunk) + "\n" for chunk in chunks).encode()
+
+@pytest.fixture
+def stream_chunks():
+    """Chunks of a typical streamed /api/generate response."""
+    return [
+        {"model": "gemma3", "response": "Hello", "done": False},
+        {"model": "gemma3", "response": ", world", "done": False},
+        {"model": "gemma3", "response": "", "done": True, "eval_count": 3},
+    ]
+
+@pytest.mark.asyncio
+async def test_generate_response_joins_stream(stream_chunks):
+    """Test that streamed chunks are joined into a single response."""
+    # Setup
+    requests = []
+
+    def handler(request):
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, content=ndjson(*stream_chunks))
+
+    connector = OllamaConnector()
+    connector.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    # Execute
+    result = await connector.generate_response("Say hello")
+
+    # Assert
+    assert result["response"] == "Hello, world"
+    assert result["done"] is True
+    assert result["eval_count"] == 3
+    assert requests[0]["stream"] is True
+    assert requests[0]["prompt"] == "Say hello"
+    assert requests[0]["options"] == {"temperature": 0.7}
+
+@pytest.mark.asyncio
+async def test_generate_response_sends_sampling_settings_as_options(stream_chunks):
+    """Test that temperature and max_tokens are sent where Ollama reads them."""
+    # Setup
+    requests = []
+
+    def handler(request):
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, content=ndjson(*stream_chunks))
+
+    connector = OllamaConnector()
+    connector.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    # Execute
+    await connector.generate_response("Say hello", temperature=0, max_tokens=32)
+
+    # Assert
+    assert requests[0]["options"] == {"temperature": 0, "num_predict": 32}
+    assert "temperature" not in requests[0]
+    assert "max_tokens" not in requests[0]
+
+@pytest.mark.asyncio
+async def test_generate_response_stream_yields_text(stream_chunks):
+    """Test that the streaming generator yields partial text in order."""
+    # Setup
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=ndjson(*stream_chunks)))
+
+    connector = OllamaConnector()
+    connector.client = httpx.AsyncClient(transport=transport)
+
+    # Execute
+    parts = [part async for part in connector.generate_response_stream("Say hello")]
+
+    # Assert
+    assert parts == ["Hello", ", world"]
+
+@pytest.mark.asyncio
+async def test_generate_response_raises_on_http_error():
+    """Test that HTTP errors from Ollama are propagated."""
+    # Setup
+    transport = httpx.MockTransport(lambda request: httpx.Response(404, json={"error": "model not found"}))
+
+    connector = OllamaConnector()
+    connector.client = httpx.AsyncClient(transport=transport)
+
+    # Execute / Assert
+    with pytest.raises(httpx.HTTPStatusError):
+        await connector.generate_response("Say hello")
+
+@pytest.mark.asyncio
+async def test_generate_response_caches_deterministic_requests(stream_chunks):
+    """Test that temperature 0 requests are served from the cache on repeat."""
+    # Setup
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, content=ndjson(*stream_chunks))
+
+    connector = OllamaConnector(cache_enabled=True)
+    connector.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    # Execute
+    first = await connector.generate_response("Say hello", temperature=0)
+    second = await connector.generate_response("Say hello", temperature=0)
+    await connector.generate_response("Say hello")
+
+    # Assert
+    assert first == second
+    assert len(requests) == 2
+    assert connector.stats == {"hits": 1, "misses": 1}
+
+@pytest.mark.asyncio
+async def test_generate_response_does_not_cache_truncated_streams(stream_chunks):
+    """Test that a stream that ended before its done chunk is not cached."""
+    # Setup
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, content=ndjson(*stream_chunks[:-1]))
+
+    connector = OllamaConnector(cache_enabled=True)
+    connector.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    # Execute
+    await connector.generate_response("Say hello", temperature=0)
+    await connector.generate_response("Say hello", temperature=0)
+
+    # Assert
+    assert len(requests) == 2
+
+@pytest.mark.asyncio
+async def test_generate_response_recovers_glued_chunks(stream_chunks):
+    """Test that chunks concatenated on one line are still decoded."""
+    # Setup
+    body = "".join(json.dumps(chunk) for chunk in stream_chunks).encode() + b"\n"
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body))
+
+    connector = OllamaConnector()
+    connector.client = httpx.AsyncClient(transport=transport)
+
+    # Execute
+    result = await connector.generate_response("Say hello")
+
+    # Assert
+    assert result["response"] == "Hello, world"
+    assert result["done"] is True
+
+@pytest.mark.asyncio
+async def test_generate_batch_respects_max_concurrency():
+    """Test that batched prompts keep their order and respect the concurrency limit."""
+    # Setup
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        prompt = json.loads(request.content)["prompt"]
+        return httpx.Response(200, content=ndjson({"response": prompt, "done": True}))
+
+    connector = OllamaConnector(max_concurrency=2)
+    connector.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    # Execute
+    results = await connector.generate_batch([f"prompt {i}" for i in range(5)])
+
+    # Assert
+    assert [result["response"] for result in results] == [f"prompt {i}" for i in range(5)]
+    assert peak == 2
+
+@pytest.mark.asyncio
+async def test_generate_response_handles_lines_split_across_reads(stream_chunks):
+    """Test that chunks split across network reads are reassembled."""
+    # Setup
+    body = ndjson(*stream_chunks).rstrip(b"\n")
+
+    async def pieces():
+        for i in range(0, len(body), 7):
+            yield body[i:i + 7]
+
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=pieces()))
+
+    connector = OllamaConnector()
+    connector.client = httpx.AsyncClient(transport=transport)
+
+    # Execute
+    result = await connector.generate_response("Say hello")
+
+    # Assert
+    assert result["response"] == "Hello, world"
+    assert result["eval_count"] == 3
+
+class TrackedStream(httpx.AsyncByteStream):
+    """Response body that records when the connection is closed."""
+
+    def __init__(self, body):
+        self.body = body
+        self.closed = False
+
+    async def __aiter__(self):
+        yield self.body
+
+    async def aclose(self):
+        self.closed = True
+
+@pytest.mark.asyncio
+async def test_stream_is_released_on_early_exit(stream_chunks):
+    """Test that the connection and concurrency slot are freed when a stream stops early."""
+    # Setup
+    streams = []
+
+    def handler(request):
+        body = ndjson(*stream_chunks) if streams else ndjson({"error": "model is loading"}, *stream_chunks)
+        streams.append(TrackedStream(body))
+        return httpx.Response(200, stream=streams[-1])
+
+    connector = OllamaConnector(max_concurrency=1)
+    connector.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    # Execute: generate_response returns on the error chunk, and a
+    # streaming consumer stops after the first part
+    result = await connector.generate_response("Say hello")
+    error_stream_closed = streams[0].closed
+
+    stream = connector.generate_response_stream("Say hello")
+    async for part in stream:
+        break
+    await stream.aclose()
+    consumer_stream_closed = streams[1].closed
+
+    # With a single slot, a new request only completes if both were released
+    final = await asyncio.wait_for(connector.generate_response("Say hello"), timeout=1)
+
+    # Assert
+    assert result["error"] == "model is loading"
+    assert error_stream_closed
+    assert consumer_stream_closed
+    assert final["response"] == "Hello, world"
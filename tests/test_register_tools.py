@@ -0,0 +1,100 @@
+import os
+import sys
+import pytest
+import httpx
+import orjson
+
+# The scripts import their shared helpers as top-level modules
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from register_tools import TOOLS, is_unchanged, register_tools
+
+def tool_manager(routes):
+    """Build a client whose requests are answered by routes[(method, path)]."""
+    requests = []
+    
+    def handler(request):
+        requests.append(request)
+        respond = routes.get((request.method, request.url.path))
+        return respond(request) if respond else httpx.Response(404)
+    
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), requests
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("batch_response", [
+    httpx.Response(400),
+    httpx.Response(422),
+    httpx.Response(500),
+    httpx.Response(200, json={"detail": "unsupported"}),
+    httpx.Response(200, json=["ok"]),
+])
+async def test_register_tools_falls_back_when_batch_fails(batch_response):
+    """Test that a batch error or unexpected body still registers every tool individually."""
+    # Setup
+    client, requests = tool_manager({
+        ("POST", "/tools:batch"): lambda request: batch_response,
+        ("GET", "/tools"): lambda request: httpx.Response(200, json=[]),
+        ("POST", "/tools"): lambda request: httpx.Response(201, json={"id": 1}),
+    })
+    
+    # Execute
+    await register_tools("http://mock-url", TOOLS, client=client)
+    
+    # Assert
+    created = [orjson.loads(r.content)["name"] for r in requests if r.method == "POST" and r.url.path == "/tools"]
+    assert created == [tool["name"] for tool in TOOLS]
+
+def test_is_unchanged_ignores_server_fields_and_key_order():
+    """Test that only the definition's fields are compared, in any order."""
+    # Setup
+    tool = TOOLS[1]
+    registered = {"id": 7, "created_at": "2024-01-01", **dict(reversed(list(tool.items())))}
+    
+    # Execute / Assert
+    assert is_unchanged(registered, tool)
+    assert not is_unchanged({**registered, "description": "Something else"}, tool)
+
+@pytest.mark.asyncio
+async def test_register_tools_skips_put_for_unchanged_tools():
+    """Test that only tools whose definition changed are updated."""
+    # Setup
+    changed = {**TOOLS[0], "id": 1, "description": "Old description"}
+    unchanged = {**TOOLS[1], "id": 2}
+    client, requests = tool_manager({
+        ("GET", "/tools"): lambda request: httpx.Response(200, json=[changed, unchanged]),
+        ("PUT", "/tools/1"): lambda request: httpx.Response(200, json={"id": 1}),
+        ("PUT", "/tools/2"): lambda request: httpx.Response(200, json={"id": 2}),
+    })
+    
+    # Execute
+    await register_tools("http://mock-url", TOOLS, client=client)
+    
+    # Assert
+    assert [r.url.path for r in requests if r.method == "PUT"] == ["/tools/1"]
+    assert not any(r.method == "POST" and r.url.path == "/tools" for r in requests)
+
+@pytest.mark.asyncio
+async def test_register_tools_looks_up_tools_missing_from_listing():
+    """Test that a tool missing from a paginated listing is updated, not duplicated."""
+    # Setup
+    registered = {**TOOLS[1], "id": 2, "description": "Old description"}
+    
+    def list_tools(request):
+        # The first page of the listing only has the first tool
+        if request.url.params.get("name") == registered["name"]:
+            return httpx.Response(200, json=[registered])
+        if "name" in request.url.params:
+            return httpx.Response(200, json=[])
+        return httpx.Response(200, json=[{**TOOLS[0], "id": 1}])
+    
+    client, requests = tool_manager({
+        ("GET", "/tools"): list_tools,
+        ("PUT", "/tools/2"): lambda request: httpx.Response(200, json={"id": 2}),
+    })
+    
+    # Execute
+    await register_tools("http://mock-url", TOOLS, client=client)
+    
+    # Assert
+    assert [r.url.path for r in requests if r.method == "PUT"] == ["/tools/2"]
+    assert not any(r.method == "POST" and r.url.path == "/tools" for r in requests)
@@ -0,0 +1,55 @@
+from app.services.semantic_cache import SemanticCache
+
+PARAGRAPH = (
+    "The quarterly report shows that revenue grew by twelve percent while operating "
+    "costs stayed flat, mostly thanks to the new logistics contracts signed in the "
+    "spring and the lower price of raw materials across all of our regional markets."
+)
+
+def test_equivalent_prompts_share_an_entry():
+    """Test that prompts differing only in surrounding whitespace hit the same entry."""
+    # Setup
+    cache = SemanticCache()
+    cache.put("What is the capital of France?", {"response": "Paris"})
+    
+    # Execute / Assert
+    assert cache.get("  What is the capital of France?\n") == {"response": "Paris"}
+
+def test_case_and_spacing_are_part_of_the_key():
+    """Test that prompts differing in case or inner spacing don't share an answer."""
+    # Setup
+    cache = SemanticCache()
+    cache.put("Capitalize 'john smith'", {"response": "John Smith"})
+    
+    # Execute / Assert
+    assert cache.get("Capitalize 'JOHN SMITH'") is None
+    assert cache.get("Capitalize 'john  smith'") is None
+
+def test_entries_expire():
+    """Test that entries are dropped once their TTL has passed."""
+    # Setup
+    cache = SemanticCache(ttl=0)
+    cache.put("What is the capital of France?", {"response": "Paris"})
+    
+    # Execute / Assert
+    assert cache.get("What is the capital of France?") is None
+
+def test_operators_are_part_of_the_key():
+    """Test that prompts differing only in an operator don't share an answer."""
+    # Setup
+    cache = SemanticCache()
+    cache.put("What is 2+2?", {"response": "4"})
+    
+    # Execute / Assert
+    assert cache.get("What is 2+2?") == {"response": "4"}
+    assert cache.get("What is 2*2?") is None
+    assert cache.get("What is 2-2?") is None
+
+def test_single_word_substitution_misses():
+    """Test that a long prompt with one substituted word is a miss."""
+    # Setup
+    cache = SemanticCache()
+    cache.put(f"Translate this paragraph to French: {PARAGRAPH}", {"response": "Le rapport..."})
+    
+    # Execute / Assert
+    assert cache.get(f"Translate this paragraph to German: {PARAGRAPH}") is None